@@ -0,0 +1,226 @@
+"""Measures the download pipeline end to end against the local media server.
+
+For each media kind and concurrency level a fresh DownloadManager downloads
+a batch of jobs through real yt-dlp, and the run reports:
+
+    jobs_per_sec, bytes_per_sec    wall-clock throughput of the whole batch
+    ttfb_ms (median / p95)         job start to the first media byte sent
+                                   for a request made after it
+    cpu_ms_per_mb                  this process's CPU time per MiB received
+                                   (with --mode process, the UI side only)
+    ui_updates_per_sec             flushes the progress aggregator would
+                                   make to the UI, next to the raw event rate
+
+Results are printed as JSON lines; --output also writes them, with the
+environment they were taken in, to a file to compare across releases:
+
+    python benchmarks/downloads.py --kinds progressive hls -c 1 4 8
+    python benchmarks/downloads.py --mode process
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from importlib import metadata
+
+from media_server import MediaServer
+
+from ytdlpg.archive import DownloadArchive, FileIndex
+from ytdlpg.cache import InfoCache
+from ytdlpg.history import HistoryStore
+from ytdlpg.journal import JobJournal
+from ytdlpg.manager import DownloadManager
+from ytdlpg.options import YtdlpOptions
+from ytdlpg.progress import ProgressAggregator
+
+
+class BenchmarkOptions(YtdlpOptions):
+    __slots__ = ()
+
+    def _compile_ydl_opts(self):
+        opts = super()._compile_ydl_opts()
+        # The served bytes are filler; ffmpeg fixups would reject them.
+        opts["fixup"] = "never"
+        opts["no_warnings"] = True
+        return opts
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(server, kind, concurrency, jobs, size, latency, fragments, mode):
+    directory = tempfile.mkdtemp(prefix="ytdlpg-bench-")
+    manager = DownloadManager(
+        None,
+        history=HistoryStore(os.path.join(directory, "history.db")),
+        info_cache=InfoCache(os.path.join(directory, "cache")),
+        archive=DownloadArchive(os.path.join(directory, "archive.txt")),
+        journal=JobJournal(os.path.join(directory, "queue.db")),
+        file_index=FileIndex(os.path.join(directory, "written.db")),
+    )
+    manager.options = BenchmarkOptions(
+        output_path=os.path.join(directory, "out"),
+        quiet=True,
+        use_archive=False,
+        max_concurrent=concurrency,
+        per_host_limit=0,
+        max_probes=concurrency,
+        concurrent_fragments=fragments,
+        execution_mode=mode,
+    )
+
+    flushes = {"count": 0, "items": 0}
+
+    def flush(batch):
+        flushes["count"] += 1
+        flushes["items"] += len(batch)
+
+    aggregator = ProgressAggregator(flush)
+    finished = threading.Semaphore(0)
+    failures = []
+    keys = {}
+    started = {}
+
+    def on_progress(download_info):
+        if download_info["status"] == "downloading":
+            started.setdefault(keys[download_info["id"]], time.time())
+        aggregator.submit(download_info["id"], download_info)
+
+    def on_error(download_info, error_message):
+        failures.append(error_message)
+        finished.release()
+
+    segments = max(1, size // (256 * 1024))
+    params = {"latency": latency}
+    if kind == "progressive":
+        params["size"] = size
+    else:
+        params.update(segments=segments, segment_size=size // segments)
+
+    server.reset()
+    cpu_start = cpu_seconds()
+    start = time.perf_counter()
+    for i in range(jobs):
+        key = f"{kind}-{concurrency}-{i}"
+        manager.download(
+            server.url(kind, key, **params),
+            on_progress,
+            lambda download_info: finished.release(),
+            on_error,
+            on_queued=lambda download_info, key=key: keys.update(
+                {download_info["id"]: key}
+            ),
+        )
+    for _ in range(jobs):
+        finished.acquire()
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_start
+    manager.history.close()
+    manager.journal.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    stats = server.stats()
+    ttfb = []
+    for key, start_time in started.items():
+        # Only media requests made by the job itself, not by its probe.
+        times = [t for t in stats["first_byte"].get(key, ()) if t >= start_time]
+        if times:
+            ttfb.append((min(times) - start_time) * 1000)
+    received = stats["bytes"]
+    progress = aggregator.stats()
+    return {
+        "kind": kind,
+        "mode": mode,
+        "concurrency": concurrency,
+        "jobs": jobs,
+        "failed": len(failures),
+        "errors": sorted(set(failures))[:3],
+        "seconds": round(elapsed, 3),
+        "jobs_per_sec": round(jobs / elapsed, 2),
+        "bytes_per_sec": round(received / elapsed),
+        "ttfb_ms_median": round(statistics.median(ttfb), 1) if ttfb else None,
+        "ttfb_ms_p95": round(percentile(ttfb, 0.95), 1) if ttfb else None,
+        "cpu_ms_per_mb": (
+            round(cpu * 1000 / (received / 1024 / 1024), 2) if received else None
+        ),
+        "progress_events_per_sec": round(progress["received"] / elapsed, 1),
+        "ui_updates_per_sec": round(flushes["count"] / elapsed, 1),
+    }
+
+
+def version(distribution):
+    try:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment():
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ytdlpg": version("ytdlpg"),
+        "yt_dlp": version("yt-dlp"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kinds", nargs="+", default=["progressive", "hls", "dash"])
+    parser.add_argument(
+        "-c", "--concurrency", nargs="+", type=int, default=[1, 2, 4, 8]
+    )
+    parser.add_argument("-n", "--jobs", type=int, default=16)
+    parser.add_argument(
+        "--size", type=int, default=8 * 1024 * 1024, help="bytes per job"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds before each response"
+    )
+    parser.add_argument("--fragments", type=int, default=4)
+    parser.add_argument("--mode", choices=("thread", "process"), default="thread")
+    parser.add_argument("-o", "--output", help="also write all results to a file")
+    args = parser.parse_args()
+
+    results = []
+    with MediaServer() as server:
+        for kind in args.kinds:
+            for concurrency in args.concurrency:
+                result = run(
+                    server,
+                    kind,
+                    concurrency,
+                    args.jobs,
+                    args.size,
+                    args.latency,
+                    args.fragments,
+                    args.mode,
+                )
+                results.append(result)
+                print(json.dumps(result))
+                sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""A local stand-in for a media site, so downloads can be benchmarked offline.
+
+It serves synthetic media that yt-dlp's generic extractor picks up on its own:
+
+    /progressive/<key>.mp4?size=BYTES            a single file (Range OK)
+    /hls/<key>.m3u8?segments=N&segment_size=B    an HLS VOD playlist
+    /dash/<key>.mpd?segments=N&segment_size=B    a DASH SegmentTemplate
+
+The bytes are filler, not decodable media, so anything that inspects the
+content (ffmpeg fixups, post-processors) has to be turned off. `<key>`
+becomes the title yt-dlp saves the file under and tells requests apart in
+the stats, which are served as JSON from /_stats (and cleared by /_reset).
+Optional `latency` (seconds) delays the response headers, to model a
+distant server. Run standalone with:
+
+    python benchmarks/media_server.py --port 8765
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process, Queue
+from urllib.parse import parse_qs, urlsplit
+
+BLOCK = os.urandom(64 * 1024)
+SEGMENT_SECONDS = 4
+
+MPD_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT2S"
+     mediaPresentationDuration="PT{duration}S"
+     profiles="urn:mpeg:dash:profile:isoff-live:2011">
+  <Period>
+    <AdaptationSet mimeType="video/mp4" contentType="video">
+      <Representation id="video" bandwidth="{bandwidth}" codecs="avc1.4d401f"
+                      width="1280" height="720">
+        <SegmentTemplate timescale="1" duration="{segment_seconds}" startNumber="0"
+                         initialization="{key}/init.mp4?{query}"
+                         media="{key}/seg$Number$.m4s?{query}"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes = 0
+            # key -> wall-clock times the first byte of each media
+            # response went out (probes fetch media too, before the job)
+            self.first_byte = {}
+
+    def sent(self, key, amount, first=False):
+        with self.lock:
+            self.bytes += amount
+            if first:
+                self.first_byte.setdefault(key, []).append(time.time())
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "first_byte": {
+                    key: list(times) for key, times in self.first_byte.items()
+                },
+            }
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stats = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        with self.stats.lock:
+            self.stats.requests += 1
+
+        if parts.path == "/_stats":
+            return self.send_text(json.dumps(self.stats.to_dict()), "application/json")
+        if parts.path == "/_reset":
+            self.stats.reset()
+            return self.send_text("ok", "text/plain")
+
+        latency = float(query.get("latency", 0))
+        if latency:
+            time.sleep(latency)
+
+        segments = int(query.get("segments", 30))
+        segment_size = int(query.get("segment_size", 256 * 1024))
+
+        match = re.fullmatch(r"/progressive/([\w-]+)\.mp4", parts.path)
+        if match:
+            return self.send_media(
+                match.group(1), int(query.get("size", 8 * 1024 * 1024)), "video/mp4"
+            )
+
+        match = re.fullmatch(r"/hls/([\w-]+)\.m3u8", parts.path)
+        if match:
+            lines = [
+                "#EXTM3U",
+                "#EXT-X-VERSION:3",
+                f"#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}",
+                "#EXT-X-MEDIA-SEQUENCE:0",
+                "#EXT-X-PLAYLIST-TYPE:VOD",
+            ]
+            for i in range(segments):
+                lines.append(f"#EXTINF:{SEGMENT_SECONDS}.0,")
+                lines.append(f"{match.group(1)}/seg{i}.ts?{parts.query}")
+            lines.append("#EXT-X-ENDLIST")
+            return self.send_text(
+                "\n".join(lines) + "\n", "application/vnd.apple.mpegurl"
+            )
+
+        match = re.fullmatch(r"/dash/([\w-]+)\.mpd", parts.path)
+        if match:
+            mpd = MPD_TEMPLATE.format(
+                key=match.group(1),
+                duration=segments * SEGMENT_SECONDS,
+                bandwidth=segment_size * 8 // SEGMENT_SECONDS,
+                segment_seconds=SEGMENT_SECONDS,
+                query=parts.query.replace("&", "&amp;"),
+            )
+            return self.send_text(mpd, "application/dash+xml")
+
+        match = re.fullmatch(r"/(hls|dash)/([\w-]+)/(?:seg\d+|init)\.\w+", parts.path)
+        if match:
+            return self.send_media(match.group(2), segment_size, "video/mp2t")
+
+        self.send_error(404)
+
+    def send_text(self, text, content_type):
+        body = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_media(self, key, size, content_type):
+        start, end = 0, size - 1
+        byte_range = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if byte_range:
+            if byte_range.group(1):
+                start = int(byte_range.group(1))
+            if byte_range.group(2):
+                end = min(int(byte_range.group(2)), size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        remaining = end - start + 1
+        first = True
+        try:
+            while remaining > 0:
+                chunk = BLOCK[: min(remaining, len(BLOCK))]
+                self.wfile.write(chunk)
+                self.stats.sent(key, len(chunk), first)
+                first = False
+                remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up early (cancelled or finished fragments) is normal.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(port=0):
+    handler = type("Handler", (MediaHandler,), {"stats": Stats()})
+    return MediaHTTPServer(("127.0.0.1", port), handler)
+
+
+def _serve(port, ready):
+    server = make_server(port)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class MediaServer:
+    """Runs the server in a child process, so its CPU time does not count
+    against the downloader being measured."""
+
+    def __init__(self, port=0):
+        self.port = port
+        self.process = None
+
+    def __enter__(self):
+        ready = Queue()
+        self.process = Process(target=_serve, args=(self.port, ready), daemon=True)
+        self.process.start()
+        self.port = ready.get(timeout=10)
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def url(self, kind, key, **params):
+        path = {
+            "progressive": f"/progressive/{key}.mp4",
+            "hls": f"/hls/{key}.m3u8",
+            "dash": f"/dash/{key}.mpd",
+        }[kind]
+        query = "&".join(f"{name}={value}" for name, value in params.items())
+        return self.base_url + path + (f"?{query}" if query else "")
+
+    def _get(self, path):
+        from urllib.request import urlopen
+
+        with urlopen(self.base_url + path) as response:
+            return response.read()
+
+    def stats(self):
+        return json.loads(self._get("/_stats"))
+
+    def reset(self):
+        self._get("/_reset")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = make_server(args.port)
+    print(f"Serving synthetic media on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
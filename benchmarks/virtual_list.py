@@ -0,0 +1,153 @@
+"""Compares the cost of adding a history row to a plain ft.Column against the
+virtualized list, as the number of rows grows.
+
+Each sample times one row insert followed by a real `page.update()`: Flet
+diffs the control tree against its snapshot, builds the update commands and
+hands them to the connection. The connection here turns them into the same
+JSON messages the desktop app's socket server sends, so the timings include
+serializing the update but not the socket write or Flutter's rebuild; the
+bytes column is the size of what would go over the socket. Run with:
+
+    python benchmarks/virtual_list.py
+"""
+
+import asyncio
+import json
+import statistics
+import time
+
+import flet as ft
+from flet.core.local_connection import LocalConnection
+from flet.core.page import Page
+from flet.core.protocol import (
+    ClientActions,
+    ClientMessage,
+    CommandEncoder,
+    PageCommandResponsePayload,
+    PageCommandsBatchResponsePayload,
+)
+
+from ytdlpg.virtual_list import VirtualList
+
+SAMPLES = 5
+
+
+class Connection(LocalConnection):
+    """Processes commands like the socket server, counting the bytes sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = 0
+
+    def send_command(self, session_id, command):
+        result, message = self._process_command(command)
+        if message:
+            self._send(message)
+        return PageCommandResponsePayload(result=result, error="")
+
+    def send_commands(self, session_id, commands):
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ["add", "get"]:
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self._send(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def _send(self, message):
+        self.sent += len(json.dumps(message, cls=CommandEncoder, separators=(",", ":")))
+
+
+def new_page():
+    conn = Connection()
+    return Page(conn, "bench", asyncio.new_event_loop()), conn
+
+
+def build_row():
+    return ft.Container(
+        content=ft.Card(content=ft.Column([ft.Text(), ft.Text()])),
+        height=150,
+        data={"item": None},
+    )
+
+
+def bind_row(row, item):
+    column = row.content.content
+    column.controls[0].value = item["title"]
+    column.controls[1].value = item["url"]
+
+
+def make_item(i):
+    return {"id": i, "title": f"Video {i}", "url": f"https://example.com/{i}"}
+
+
+def measure(page, conn, insert):
+    times, sizes = [], []
+    for _ in range(SAMPLES):
+        conn.sent = 0
+        start = time.perf_counter()
+        insert()
+        page.update()
+        times.append(time.perf_counter() - start)
+        sizes.append(conn.sent)
+    return statistics.median(times), statistics.median(sizes)
+
+
+def bench_column(size):
+    page, conn = new_page()
+    column = ft.Column()
+    for i in range(size):
+        row = build_row()
+        bind_row(row, make_item(i))
+        column.controls.insert(0, row)
+    page.add(column)
+
+    count = [size]
+
+    def insert():
+        row = build_row()
+        bind_row(row, make_item(count[0]))
+        column.controls.insert(0, row)
+        count[0] += 1
+
+    return measure(page, conn, insert)
+
+
+def bench_virtual(size):
+    page, conn = new_page()
+    virtual = VirtualList(build_row, bind_row, item_extent=150, height=280)
+    virtual.set_items(make_item(i) for i in range(size))
+    page.add(virtual.view)
+
+    count = [size]
+
+    def insert():
+        virtual.insert(0, make_item(count[0]))
+        count[0] += 1
+
+    return measure(page, conn, insert)
+
+
+def main():
+    for size in (100, 1_000, 10_000, 50_000):
+        column_time, column_bytes = bench_column(size)
+        virtual_time, virtual_bytes = bench_virtual(size)
+        print(
+            json.dumps(
+                {
+                    "rows": size,
+                    "column_update_ms": round(column_time * 1000, 3),
+                    "column_update_bytes": column_bytes,
+                    "virtual_update_ms": round(virtual_time * 1000, 3),
+                    "virtual_update_bytes": virtual_bytes,
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,3 @@
-from ytdlpg.main import python_main
+from ytdlpg.cli import cli_main
 
-python_main()
+cli_main()
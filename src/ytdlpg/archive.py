@@ -0,0 +1,253 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+from ytdlpg.cache import YOUTUBE_ID_RE
+
+# Bytes hashed from each end of a file for its quick content hash.
+HASH_CHUNK = 1024 * 1024
+
+# The video id yt-dlp style file names end with: "Title [id].ext".
+MEDIA_ID_RE = re.compile(r"\[([\w-]{6,})\]\.\w+$")
+
+
+def archive_id(extractor, video_id):
+    # Same "<extractor> <id>" lines that yt-dlp's --download-archive writes.
+    return f"{extractor.lower()} {video_id}"
+
+
+def archive_id_from_url(url):
+    match = YOUTUBE_ID_RE.search(url)
+    if match:
+        return archive_id("youtube", match.group(1))
+    return None
+
+
+def archive_id_from_info(info):
+    if info.get("_type", "video") not in ("video", "url"):
+        return None
+    extractor = info.get("extractor_key") or info.get("ie_key")
+    if extractor and info.get("id"):
+        return archive_id(extractor, info["id"])
+    return None
+
+
+class DownloadArchive:
+    """In-memory index over a yt-dlp compatible download archive file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = set()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._ids = {line.strip() for line in f if line.strip()}
+        except OSError:
+            pass
+
+    def __contains__(self, entry_id):
+        return entry_id is not None and entry_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, entry_id):
+        with self._lock:
+            if entry_id is None or entry_id in self._ids:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(entry_id + "\n")
+            self._ids.add(entry_id)
+
+
+def quick_hash(path):
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(HASH_CHUNK))
+        if size > 2 * HASH_CHUNK:
+            f.seek(-HASH_CHUNK, os.SEEK_END)
+            digest.update(f.read(HASH_CHUNK))
+    return digest.hexdigest()
+
+
+class ContentIndex:
+    """Quick content hashes of the files in the output directories, so a
+    finished download can be matched against media that is already there.
+
+    Files whose name carries a video id ("Title [id].ext", as yt-dlp and
+    our output templates name them) are also indexed by that id, which
+    lets a URL be matched against them before anything is extracted.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_hash ON files (hash);
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+        if "media_id" not in columns:
+            # Indexes written before files were indexed by id.
+            self._conn.execute("ALTER TABLE files ADD COLUMN media_id TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_files_media_id ON files (media_id)"
+        )
+
+    def add(self, path, media_id=None):
+        stat = os.stat(path)
+        if media_id is None:
+            match = MEDIA_ID_RE.search(os.path.basename(path))
+            media_id = match.group(1) if match else None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, hash, media_id FROM files WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            if row[3] != media_id:
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "UPDATE files SET media_id = ? WHERE path = ?",
+                        (media_id, path),
+                    )
+            return row[2]
+
+        file_hash = quick_hash(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime, hash, media_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, file_hash, media_id),
+            )
+        return file_hash
+
+    def find_duplicate(self, path, media_id=None):
+        file_hash = self.add(path, media_id)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM files WHERE hash = ? AND path != ?",
+                (file_hash, path),
+            ).fetchall()
+        for (other,) in rows:
+            if os.path.exists(other):
+                return other
+        return None
+
+    def find_media(self, media_id, directory=None):
+        """A file in the index for video `media_id` that still exists, under
+        `directory` if given (the index remembers every directory seen)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM files WHERE media_id = ?", (media_id,)
+            ).fetchall()
+        if directory is not None:
+            directory = os.path.abspath(directory)
+        for (path,) in rows:
+            if directory is not None and not _is_within(path, directory):
+                continue
+            if os.path.exists(path):
+                return path
+        return None
+
+    def scan(self, directory):
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith((".part", ".ytdl", ".tmp")) or ".part-Frag" in name:
+                    continue
+                try:
+                    self.add(os.path.join(root, name))
+                except OSError:
+                    pass
+
+
+def _is_within(path, directory):
+    path = os.path.abspath(path)
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        # Different drives on Windows.
+        return False
+
+
+class FileIndex:
+    """The files finished downloads wrote, by media and output directory.
+
+    Whether a video is already in an output directory is then a lookup here
+    and a stat of the paths found, never a listing of the directory, which
+    gets slow once it holds tens of thousands of files (or sits on a
+    network share). `variant` tells apart downloads of the same video that
+    produce different files, e.g. the video and its extracted audio.
+    """
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS written (
+                path TEXT PRIMARY KEY,
+                entry_id TEXT NOT NULL,
+                root TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                size INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_written_entry
+                ON written (entry_id, root, variant);
+            """
+        )
+
+    def add(self, entry_id, root, variant, paths):
+        rows = []
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            rows.append((path, entry_id, os.path.abspath(root), variant, size))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO written (path, entry_id, root, variant, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def find(self, entry_id, root, variant):
+        """A file written for `entry_id` under `root` that still exists, or
+        None. Entries for files that are gone are dropped."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM written WHERE entry_id = ? AND root = ? "
+                "AND variant = ?",
+                (entry_id, os.path.abspath(root), variant),
+            ).fetchall()
+        gone = []
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+            gone.append((path,))
+        if gone:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM written WHERE path = ?", gone)
+        return None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,249 @@
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+RATE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b(?:/s)?)?\s*$", re.I)
+UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+# How often the shares are recomputed while jobs are running, so that
+# schedule boundaries take effect without a job starting or finishing.
+REBALANCE_INTERVAL = 5.0
+
+
+def parse_rate(text):
+    """'500K', '2M', '1.5mb/s' -> bytes per second. Empty or 0 means no limit."""
+    if text is None or text == "":
+        return 0
+    if isinstance(text, (int, float)):
+        return int(text)
+    match = RATE_RE.match(text)
+    if not match:
+        raise ValueError(f"Invalid rate: {text!r}")
+    return int(float(match.group(1)) * UNITS[match.group(2).lower()])
+
+
+def format_rate(rate):
+    if not rate:
+        return "Unlimited"
+    for unit, size in (("G", 1024**3), ("M", 1024**2), ("K", 1024)):
+        if rate >= size:
+            return f"{rate / size:g}{unit}"
+    return str(int(rate))
+
+
+def _parse_time(text):
+    hours, minutes = (int(value) for value in text.strip().split(":"))
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time: {text.strip()!r}")
+    return hours * 60 + minutes
+
+
+def parse_schedule(text):
+    """'09:00-18:00=1M, 23:00-07:00=0' -> [(start, end, rate)], in minutes.
+
+    Ranges may wrap past midnight. The first matching range wins.
+    """
+    schedule = []
+    for part in re.split(r"[,;\n]", text or ""):
+        if not part.strip():
+            continue
+        try:
+            span, rate = part.split("=")
+            start, end = span.split("-")
+            schedule.append((_parse_time(start), _parse_time(end), parse_rate(rate)))
+        except ValueError:
+            raise ValueError(f"Invalid schedule entry: {part.strip()!r}")
+    return schedule
+
+
+def scheduled_rate(schedule, default, now=None):
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for start, end, rate in schedule:
+        if start <= end:
+            if start <= minute < end:
+                return rate
+        elif minute >= start or minute < end:
+            return rate
+    return default
+
+
+def fair_shares(total, caps):
+    """Split `total` bytes/s between jobs, never giving one more than its cap.
+
+    `caps` maps job -> own limit (0 = none). Bandwidth a capped job cannot
+    use is handed to the others (max-min fairness). Returns job -> rate,
+    with 0 meaning unthrottled.
+    """
+    if not total:
+        return dict(caps)
+
+    shares = {}
+    remaining = total
+    pending = sorted(caps, key=lambda job: caps[job] or float("inf"))
+    while pending:
+        fair = remaining / len(pending)
+        job = pending[0]
+        if caps[job] and caps[job] <= fair:
+            shares[job] = caps[job]
+            remaining -= caps[job]
+            pending.pop(0)
+            continue
+        for job in pending:
+            shares[job] = fair
+        break
+    return shares
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens (bytes) per second, holding at most
+    `burst` of them. A rate of 0 lets everything through."""
+
+    def __init__(self, rate=0, burst=None):
+        self._lock = threading.Lock()
+        self.rate = 0
+        self.burst = 0
+        self.tokens = 0
+        self.last = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            # Half a second worth of data by default, but at least one block.
+            self.burst = burst or max(rate / 2, 64 * 1024)
+            self.tokens = min(self.tokens, self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def consume(self, amount, stop_event=None):
+        """Take `amount` tokens, sleeping until they are available. The debt
+        of a block larger than the bucket is paid off by waiting longer."""
+        while True:
+            with self._lock:
+                if not self.rate:
+                    return
+                self._refill()
+                if self.tokens >= min(amount, self.burst):
+                    self.tokens -= amount
+                    return
+                delay = (min(amount, self.burst) - self.tokens) / self.rate
+
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return
+            else:
+                time.sleep(delay)
+
+
+class RateMeter:
+    """Measured throughput over a short sliding window."""
+
+    def __init__(self, window=3.0):
+        self.window = window
+        self._samples = deque()
+        self._bytes = 0
+
+    def add(self, amount, now=None):
+        now = now or time.monotonic()
+        self._samples.append((now, amount))
+        self._bytes += amount
+        self._trim(now)
+
+    def _trim(self, now):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._bytes -= self._samples.popleft()[1]
+
+    def rate(self, now=None):
+        now = now or time.monotonic()
+        self._trim(now)
+        if not self._samples:
+            return 0
+        elapsed = max(now - self._samples[0][0], 1.0)
+        return self._bytes / elapsed
+
+
+class BandwidthShaper:
+    """Shares a global rate limit between the running jobs.
+
+    Every job gets its own token bucket; the global limit (or the limit of
+    the active schedule entry) is split fairly between them, and the split
+    is recomputed whenever a job starts, finishes or changes its own limit.
+    Downloads call throttle() with each block they receive; downloads run
+    in a worker process only record() them and get their share sent over.
+    """
+
+    def __init__(self, get_limit):
+        self._get_limit = get_limit
+        self._lock = threading.Lock()
+        # job id -> [bucket, own limit, meter]
+        self._jobs = {}
+        self._total = RateMeter()
+        self._balanced_at = 0
+
+    def register(self, job_id, limit=0):
+        with self._lock:
+            self._jobs[job_id] = [TokenBucket(), limit or 0, RateMeter()]
+            self._rebalance()
+
+    def unregister(self, job_id):
+        with self._lock:
+            if self._jobs.pop(job_id, None) is not None:
+                self._rebalance()
+
+    def set_job_limit(self, job_id, limit):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id][1] = limit or 0
+                self._rebalance()
+
+    def rebalance(self):
+        with self._lock:
+            self._rebalance()
+
+    def _rebalance(self):
+        self._balanced_at = time.monotonic()
+        shares = fair_shares(
+            self._get_limit(), {job_id: job[1] for job_id, job in self._jobs.items()}
+        )
+        for job_id, rate in shares.items():
+            self._jobs[job_id][0].set_rate(rate)
+
+    def record(self, job_id, amount):
+        """Count `amount` bytes for `job_id` without waiting for its bucket;
+        returns the bucket, or None for an unknown job."""
+        now = time.monotonic()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job[2].add(amount, now)
+            self._total.add(amount, now)
+            if now - self._balanced_at > REBALANCE_INTERVAL:
+                self._rebalance()
+            return job[0]
+
+    def throttle(self, job_id, amount, stop_event=None):
+        bucket = self.record(job_id, amount)
+        if bucket is not None:
+            bucket.consume(amount, stop_event)
+
+    def job_rate(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job[2].rate() if job else 0
+
+    def job_limit(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job[0].rate if job else 0
+
+    def total_rate(self):
+        with self._lock:
+            return self._total.rate()
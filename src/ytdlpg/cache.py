@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+YOUTUBE_ID_RE = re.compile(
+    r"(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/|v/)"
+    r"|youtu\.be/)"
+    r"([\w-]{11})"
+)
+
+
+def cache_key(url):
+    match = YOUTUBE_ID_RE.search(url)
+    if match:
+        return f"youtube:{match.group(1)}"
+
+    parts = urlsplit(url.strip())
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, "")
+    )
+
+
+class InfoCache:
+    """Extracted yt-dlp info dicts on disk, one JSON file per URL.
+
+    Entries older than `ttl` seconds are treated as misses (format URLs
+    expire), and the least recently used files are evicted once the cache
+    grows past `max_bytes`. Infos extracted with playlists enabled are kept
+    apart (`playlist=True`): for "watch?v=X&list=Y" they hold the whole
+    playlist, which a single-video download must never be handed.
+    """
+
+    def __init__(self, directory, ttl=3600, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # file name -> [size, last used]
+        self._entries = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                self._entries[entry.name] = [stat.st_size, stat.st_mtime]
+        self._size = sum(size for size, _ in self._entries.values())
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _filename(self, url, playlist=False):
+        key = cache_key(url) + (" playlist" if playlist else "")
+        return hashlib.sha1(key.encode()).hexdigest() + ".json"
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.directory, name), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url, playlist=False):
+        name = self._filename(url, playlist)
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+
+        entry = self._read(name)
+        now = time.time()
+        with self._lock:
+            if entry is None or now - entry["time"] > self.ttl:
+                self.misses += 1
+                if entry is not None:
+                    self.expired += 1
+                self._remove(name)
+                return None
+
+            self.hits += 1
+            if name in self._entries:
+                self._entries[name][1] = now
+        try:
+            os.utime(os.path.join(self.directory, name), (now, now))
+        except OSError:
+            pass
+        return entry["info"]
+
+    def peek(self, url, playlist=False):
+        # Like get(), but without counting towards the hit/miss stats.
+        name = self._filename(url, playlist)
+        with self._lock:
+            if name not in self._entries:
+                return None
+        entry = self._read(name)
+        if entry is None or time.time() - entry["time"] > self.ttl:
+            return None
+        return entry["info"]
+
+    def peek_title(self, url):
+        info = self.peek(url)
+        return info.get("title") if info else None
+
+    def put(self, url, info, playlist=False):
+        name = self._filename(url, playlist)
+        data = json.dumps({"url": url, "time": time.time(), "info": info})
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if name in self._entries:
+                self._size -= self._entries[name][0]
+            self._entries[name] = [len(data), time.time()]
+            self._size += len(data)
+            self._evict()
+
+    def invalidate(self, url, playlist=False):
+        with self._lock:
+            self._remove(self._filename(url, playlist))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _remove(self, name):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._size -= entry[0]
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        for name, _ in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._size <= self.max_bytes:
+                break
+            self._remove(name)
+            self.evictions += 1
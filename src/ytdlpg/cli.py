@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from ytdlpg import startup
+
+
+def read_urls(source):
+    from ytdlpg.urls import extract_urls, unique_urls
+
+    f = sys.stdin if source == "-" else open(source, "r")
+    try:
+        urls = []
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                # CSV rows and pasted text may hold several links per line.
+                urls += extract_urls(line) or [line]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return unique_urls(urls)[0]
+
+
+def emit(event, download_info=None, **fields):
+    record = {"event": event, "time": round(time.time(), 3)}
+    if download_info is not None:
+        record.update(
+            id=download_info["id"],
+            url=download_info["url"],
+            title=download_info["title"],
+            status=download_info["status"],
+            progress=round(download_info["progress"], 1),
+        )
+        if download_info.get("speed"):
+            record["speed"] = download_info["speed"]
+    record.update(fields)
+    sys.stdout.write(json.dumps(record, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def run_batch(args):
+    # Only the engine is imported here; the Flet UI never loads in batch mode.
+    from ytdlpg.bandwidth import parse_rate, parse_schedule
+    from ytdlpg.journal import JobJournal
+    from ytdlpg.layout import OUTPUT_TEMPLATES, check_template
+    from ytdlpg.manager import DownloadManager
+    from ytdlpg.options import OPTION_NAMES, default_data_path
+    from ytdlpg.progress import ProgressAggregator
+
+    # Kept apart from the GUI's queue so the two never pick up each other's jobs.
+    journal = JobJournal(os.path.join(default_data_path, "batch-queue.db"))
+    if not args.resume:
+        journal.clear()
+    download_manager = DownloadManager(None, journal=journal)
+    changes = {}
+    if args.settings:
+        with open(args.settings, "r") as f:
+            for key, value in json.load(f).items():
+                if key in OPTION_NAMES:
+                    changes[key] = value
+
+    if args.output:
+        changes["output_path"] = args.output
+    if args.format:
+        changes["format"] = args.format
+    if args.audio:
+        changes["extract_audio"] = True
+        changes["audio_format"] = args.audio
+    changes["max_concurrent"] = args.concurrency
+    changes["per_host_limit"] = args.per_host
+    changes["quiet"] = True
+    if args.retries is not None:
+        changes["max_retries"] = args.retries
+    if args.template:
+        changes["output_template"] = OUTPUT_TEMPLATES.get(args.template, args.template)
+        check_template(changes["output_template"])
+    if args.staging:
+        changes["staging_path"] = args.staging
+    if args.processes:
+        changes["execution_mode"] = "process"
+    if args.concurrent_fragments:
+        changes["concurrent_fragments"] = args.concurrent_fragments
+    if args.downloader:
+        changes["external_downloader"] = args.downloader
+    if args.no_archive:
+        changes["use_archive"] = False
+    if args.metrics_port:
+        changes["metrics_port"] = args.metrics_port
+    if args.event_log:
+        changes["event_log"] = args.event_log
+    if args.limit_rate:
+        changes["rate_limit"] = parse_rate(args.limit_rate)
+    if args.rate_schedule:
+        parse_schedule(args.rate_schedule)
+        changes["rate_schedule"] = args.rate_schedule
+    download_manager.options = download_manager.options.replace(**changes)
+    download_manager.configure_telemetry()
+
+    # With --resume alone there is nothing new to read.
+    source = args.source or (None if args.resume else "-")
+    urls = read_urls(source) if source else []
+    if not urls and not journal.unfinished():
+        emit("finished", total=0, completed=0, failed=0)
+        return 0
+
+    # One extra count holds the batch open until every job is queued.
+    remaining = {"count": 1, "total": 0, "failed": 0}
+    lock = threading.Lock()
+    all_done = threading.Event()
+
+    def finish(download_info, failed):
+        # Playlist items report individually; only top-level jobs count.
+        if "parent_id" in download_info:
+            return
+        with lock:
+            remaining["count"] -= 1
+            remaining["failed"] += failed
+            if remaining["count"] == 0:
+                all_done.set()
+
+    def on_queued(download_info):
+        emit("queued", download_info)
+        if "parent_id" not in download_info:
+            with lock:
+                remaining["count"] += 1
+                remaining["total"] += 1
+
+    def flush_progress(batch):
+        for download_info in batch:
+            emit("progress", download_info)
+
+    progress = ProgressAggregator(flush_progress, interval=args.progress_interval)
+
+    def on_progress(download_info):
+        progress.submit(download_info["id"], download_info)
+
+    def on_complete(download_info):
+        progress.discard(download_info["id"])
+        emit(
+            download_info["status"],
+            download_info,
+            metrics=download_info.get("metrics"),
+        )
+        finish(download_info, 0)
+
+    def on_error(download_info, error_message):
+        progress.discard(download_info["id"])
+        emit(
+            "error",
+            download_info,
+            error=error_message,
+            metrics=download_info.get("metrics"),
+        )
+        finish(download_info, 1)
+
+    jobs = download_manager.restore(
+        on_progress, on_complete, on_error, on_queued=on_queued
+    )
+    # URLs the restored jobs already cover are left out here.
+    for download_info in download_manager.download_many(
+        urls, on_progress, on_complete, on_error, on_queued=on_queued
+    ):
+        if download_info["status"] == "skipped":
+            emit("skipped", download_info)
+            with lock:
+                remaining["total"] += 1
+        else:
+            jobs.append(download_info)
+    finish({}, 0)
+
+    try:
+        while not all_done.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        for download_info in jobs:
+            if download_manager.cancel(download_info["id"]):
+                emit("cancelled", download_info)
+        return 130
+
+    emit(
+        "finished",
+        total=remaining["total"],
+        completed=remaining["total"] - remaining["failed"],
+        failed=remaining["failed"],
+    )
+    return 1 if remaining["failed"] else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ytdlpg")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print import and first-paint timings to stderr",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser(
+        "batch", help="download URLs without the GUI, printing JSON lines"
+    )
+    batch.add_argument(
+        "source", nargs="?", help="file with one URL per line (default/- = stdin)"
+    )
+    batch.add_argument(
+        "--resume",
+        action="store_true",
+        help="also finish the jobs an interrupted batch left behind",
+    )
+    batch.add_argument("-j", "--concurrency", type=int, default=3)
+    batch.add_argument("--per-host", type=int, default=2, help="0 = no limit")
+    batch.add_argument(
+        "--retries",
+        type=int,
+        help="attempts after a network error or rate limit (default 3)",
+    )
+    batch.add_argument("-o", "--output", help="output directory")
+    batch.add_argument(
+        "--template",
+        help="output file name template, or a preset: "
+        "'Title and ID', 'By Uploader', 'By Date', 'By ID Hash'",
+    )
+    batch.add_argument(
+        "--staging",
+        metavar="DIR",
+        help="write in-progress files here and move them to --output when done",
+    )
+    batch.add_argument("-f", "--format", help="yt-dlp format selector")
+    batch.add_argument("--audio", metavar="CODEC", help="extract audio (mp3, m4a...)")
+    batch.add_argument("--settings", help="settings JSON exported from the GUI")
+    batch.add_argument(
+        "--processes",
+        action="store_true",
+        help="run each download in a worker process",
+    )
+    batch.add_argument(
+        "-N",
+        "--concurrent-fragments",
+        type=int,
+        help="HLS/DASH fragments to fetch at once",
+    )
+    batch.add_argument("--downloader", help="external downloader to use, e.g. aria2c")
+    batch.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="download even if the archive says it was fetched before",
+    )
+    batch.add_argument(
+        "-r", "--limit-rate", metavar="RATE", help="total speed limit, e.g. 2M"
+    )
+    batch.add_argument(
+        "--rate-schedule",
+        metavar="SCHEDULE",
+        help="time-of-day limits, e.g. '09:00-18:00=1M, 23:00-07:00=0'",
+    )
+    batch.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    batch.add_argument("--event-log", metavar="PATH", help="append job events as JSONL")
+    batch.add_argument(
+        "--progress-interval",
+        type=float,
+        default=1.0,
+        help="seconds between batches of progress lines",
+    )
+
+    tune = subparsers.add_parser(
+        "tune",
+        help="benchmark transfer settings on a URL and keep the fastest",
+    )
+    tune.add_argument("url", help="a long video or HLS/DASH stream to test with")
+    tune.add_argument(
+        "--seconds", type=float, default=15, help="time spent on each setting"
+    )
+    tune.add_argument("-f", "--format", help="yt-dlp format selector")
+    tune.add_argument(
+        "--no-save",
+        action="store_true",
+        help="only print the results, keep the current defaults",
+    )
+    return parser
+
+
+def run_tune(args):
+    from ytdlpg.tuning import save_tuning, tune
+
+    results = tune(
+        args.url,
+        seconds=args.seconds,
+        format=args.format,
+        on_result=lambda result: emit("measured", **result),
+    )
+    best = results[0]
+    if "error" in best or not best["rate"]:
+        emit("failed", error=best.get("error", "nothing was downloaded"))
+        return 1
+    if args.no_save:
+        emit("fastest", **best)
+    else:
+        emit("tuned", **save_tuning(best))
+    return 0
+
+
+def cli_main(argv=None):
+    args = build_parser().parse_args(argv)
+    startup.enabled = args.profile_startup
+    startup.mark("arguments parsed")
+
+    if args.command == "batch":
+        sys.exit(run_batch(args))
+    if args.command == "tune":
+        sys.exit(run_tune(args))
+
+    from ytdlpg.main import python_main
+
+    startup.mark("ui modules imported")
+    python_main()
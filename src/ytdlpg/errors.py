@@ -0,0 +1,65 @@
+import random
+import re
+
+TRANSIENT = "transient"
+RATE_LIMITED = "rate_limited"
+FORBIDDEN = "forbidden"
+UNAVAILABLE = "unavailable"
+UNKNOWN = "unknown"
+
+# Worth another attempt after a pause; the rest will fail the same way again.
+RETRYABLE = (TRANSIENT, RATE_LIMITED)
+
+# First match wins, so the more specific patterns come first.
+PATTERNS = (
+    (RATE_LIMITED, r"HTTP Error 429|Too Many Requests|rate.?limit"),
+    (
+        FORBIDDEN,
+        r"not available in your country|geo.?restrict|HTTP Error 40[13]\b|"
+        r"Sign in to confirm|login required|members.only|Private video|"
+        r"account.*(?:terminated|suspended)|age.restricted|DRM",
+    ),
+    (
+        UNAVAILABLE,
+        r"Video unavailable|has been removed|no longer available|does not exist|"
+        r"HTTP Error 40[45679]|HTTP Error 410|Unsupported URL|not a valid URL|"
+        r"Requested format is not available|No video formats found",
+    ),
+    (
+        TRANSIENT,
+        r"HTTP Error (?:408|5\d\d)|timed? ?out|Connection (?:reset|refused|aborted)|"
+        r"Remote end closed|IncompleteRead|Temporary failure|Name or service not known|"
+        r"Network is unreachable|getaddrinfo failed|EOF occurred|"
+        r"Unable to download (?:webpage|video data|JSON)|Got error|"
+        r"fragment .* not found|The downloaded file is empty",
+    ),
+)
+PATTERNS = tuple((name, re.compile(pattern, re.I)) for name, pattern in PATTERNS)
+
+
+def _messages(error):
+    # yt-dlp wraps the original exception; look at the whole chain.
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield str(error)
+        exc_info = getattr(error, "exc_info", None)
+        cause = exc_info[1] if exc_info else None
+        error = cause or error.__cause__ or error.__context__
+
+
+def classify(error):
+    for message in _messages(error):
+        for name, pattern in PATTERNS:
+            if pattern.search(message):
+                return name
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return TRANSIENT
+    return UNKNOWN
+
+
+def backoff_delay(attempt, base=2.0, cap=300.0):
+    """Exponential backoff with jitter: somewhere between half and all of
+    base * 2^attempt, so jobs that failed together do not retry together."""
+    delay = min(cap, base * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
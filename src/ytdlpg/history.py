@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    title TEXT,
+    status TEXT NOT NULL,
+    extractor TEXT,
+    path TEXT,
+    error TEXT,
+    duration REAL,
+    start_time TEXT,
+    end_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_status ON downloads (status);
+CREATE INDEX IF NOT EXISTS idx_downloads_url ON downloads (url);
+CREATE INDEX IF NOT EXISTS idx_downloads_extractor ON downloads (extractor);
+CREATE INDEX IF NOT EXISTS idx_downloads_end_time ON downloads (end_time);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS playlist_entries (
+    playlist_id TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, entry_id)
+);
+"""
+
+COLUMNS = (
+    "id",
+    "url",
+    "title",
+    "status",
+    "extractor",
+    "path",
+    "error",
+    "duration",
+    "start_time",
+    "end_time",
+)
+
+
+def _to_text(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _row_to_info(row):
+    info = {"history_id": row[0]}
+    for key, value in zip(COLUMNS[1:], row[1:]):
+        if value is None:
+            continue
+        if key in ("start_time", "end_time"):
+            value = datetime.fromisoformat(value)
+        info[key] = value
+    return info
+
+
+class HistoryStore:
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        # Counters are kept up to date on every insert, so reading them
+        # never needs to scan the downloads table.
+        self._counts = dict(self._conn.execute("SELECT name, count FROM counters"))
+
+    def add(self, download_info):
+        values = (
+            download_info["url"],
+            download_info.get("title"),
+            download_info["status"],
+            download_info.get("extractor"),
+            download_info.get("path"),
+            download_info.get("error"),
+            download_info.get("duration"),
+            _to_text(download_info.get("start_time")),
+            _to_text(download_info.get("end_time")),
+        )
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"INSERT INTO downloads ({', '.join(COLUMNS[1:])}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+            for name in ("total", download_info["status"]):
+                self._conn.execute(
+                    "INSERT INTO counters (name, count) VALUES (?, 1) "
+                    "ON CONFLICT (name) DO UPDATE SET count = count + 1",
+                    (name,),
+                )
+                self._counts[name] = self._counts.get(name, 0) + 1
+
+        download_info["history_id"] = cursor.lastrowid
+        return cursor.lastrowid
+
+    def count(self, name="total"):
+        return self._counts.get(name, 0)
+
+    def page(self, before_id=None, limit=50, status=None, after_id=None):
+        """Up to `limit` rows, newest first: the newest ones older than
+        `before_id`, or with `after_id` the oldest ones newer than it."""
+        query = f"SELECT {', '.join(COLUMNS)} FROM downloads"
+        clauses, params = [], []
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if after_id is not None:
+            clauses.append("id > ?")
+            params.append(after_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += f" ORDER BY id {'ASC' if after_id is not None else 'DESC'} LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        if after_id is not None:
+            rows.reverse()
+        return [_row_to_info(row) for row in rows]
+
+    def find_by_url(self, url):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM downloads "
+                "WHERE url = ? ORDER BY id DESC",
+                (url,),
+            ).fetchall()
+        return [_row_to_info(row) for row in rows]
+
+    def failed_urls(self):
+        """URLs whose most recent attempt failed, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM downloads d WHERE status = 'error' "
+                "AND id = (SELECT MAX(id) FROM downloads WHERE url = d.url) "
+                "ORDER BY id"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_playlist_entry(self, playlist_id, entry_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO playlist_entries (playlist_id, entry_id) "
+                "VALUES (?, ?)",
+                (playlist_id, entry_id),
+            )
+
+    def playlist_entries(self, playlist_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry_id FROM playlist_entries WHERE playlist_id = ?",
+                (playlist_id,),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
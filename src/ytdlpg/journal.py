@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    title TEXT,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    format TEXT,
+    rate_limit INTEGER NOT NULL DEFAULT 0,
+    path TEXT,
+    playlist INTEGER NOT NULL DEFAULT 0,
+    partial_files TEXT,
+    options TEXT,
+    created TEXT,
+    updated TEXT
+);
+"""
+
+COLUMNS = (
+    "url",
+    "title",
+    "status",
+    "priority",
+    "format",
+    "rate_limit",
+    "path",
+    "playlist",
+    "partial_files",
+    "options",
+    "updated",
+)
+
+
+class JobJournal:
+    """Jobs that have not finished yet. Every state change is written
+    through, so after a restart or a crash the queue can be rebuilt from
+    here; finished jobs are removed and only live on in the history."""
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "options" not in columns:
+            # Journals written before jobs kept their own options.
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN options TEXT")
+
+    def save(
+        self,
+        journal_id,
+        download_info,
+        format=None,
+        rate_limit=0,
+        partial_files=(),
+        options=None,
+    ):
+        """Insert or update a job; returns its journal id. `options` is the
+        job's YtdlpOptions, so a restored job downloads as it was queued."""
+        return self.save_many(
+            [(journal_id, download_info, format, rate_limit, partial_files, options)]
+        )[0]
+
+    def save_many(self, entries):
+        """save() for (journal_id, download_info, format, rate_limit,
+        partial_files, options) tuples, in one transaction."""
+        now = datetime.now().isoformat()
+        ids = []
+        with self._lock, self._conn:
+            for (
+                journal_id,
+                download_info,
+                format,
+                rate_limit,
+                partial_files,
+                options,
+            ) in entries:
+                values = (
+                    download_info["url"],
+                    download_info.get("title"),
+                    download_info["status"],
+                    download_info.get("priority", 0),
+                    format,
+                    rate_limit or 0,
+                    download_info.get("path"),
+                    int(bool(download_info.get("playlist"))),
+                    json.dumps(sorted(partial_files)),
+                    json.dumps(options.to_dict()) if options is not None else None,
+                    now,
+                )
+                if journal_id is None:
+                    cursor = self._conn.execute(
+                        f"INSERT INTO jobs ({', '.join(COLUMNS)}, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        values + (now,),
+                    )
+                    journal_id = cursor.lastrowid
+                else:
+                    self._conn.execute(
+                        f"UPDATE jobs SET {', '.join(f'{c} = ?' for c in COLUMNS)} "
+                        "WHERE id = ?",
+                        values + (journal_id,),
+                    )
+                ids.append(journal_id)
+        return ids
+
+    def remove(self, journal_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (journal_id,))
+
+    def unfinished(self):
+        """Journaled jobs in the order they should be queued again."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM jobs "
+                "ORDER BY priority DESC, id"
+            ).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(zip(("id",) + COLUMNS, row))
+            entry["playlist"] = bool(entry["playlist"])
+            entry["partial_files"] = json.loads(entry["partial_files"] or "[]")
+            entry["options"] = json.loads(entry["options"] or "null")
+            entries.append(entry)
+        return entries
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from ytdlpg.archive import archive_id_from_info
+
+# File name templates offered in the settings, relative to the output
+# directory. All but the first keep the video id in the name, so videos
+# with the same title no longer overwrite each other, and all but the
+# first two spread files over subdirectories instead of one flat folder.
+OUTPUT_TEMPLATES = {
+    "Title": "%(title)s.%(ext)s",
+    "Title and ID": "%(title)s [%(id)s].%(ext)s",
+    "By Uploader": "%(uploader,channel|Unknown)s/%(title)s [%(id)s].%(ext)s",
+    "By Date": (
+        "%(upload_date>%Y|Unknown)s/%(upload_date>%m|00)s/%(title)s [%(id)s].%(ext)s"
+    ),
+    # 256 evenly filled directories, whatever the uploaders and dates.
+    "By ID Hash": "%(id_shard)s/%(title)s [%(id)s].%(ext)s",
+}
+
+
+def check_template(template):
+    """Raise ValueError if `template` is not a usable relative output
+    template."""
+    if not template.strip():
+        raise ValueError("The template is empty")
+    if os.path.isabs(template) or template.startswith("~"):
+        raise ValueError("The template must be relative to the output directory")
+    if ".." in template.replace("\\", "/").split("/"):
+        raise ValueError("The template must stay inside the output directory")
+    if "%(ext)s" not in template:
+        raise ValueError("The template must contain %(ext)s")
+
+
+def id_shard(info):
+    key = archive_id_from_info(info) or info.get("webpage_url") or info.get("id")
+    return hashlib.sha1(str(key).encode()).hexdigest()[:2]
+
+
+def add_template_fields(info):
+    """Add the fields our templates use beyond yt-dlp's own to `info`."""
+    info.setdefault("id_shard", id_shard(info))
+    return info
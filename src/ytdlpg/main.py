@@ -1,14 +1,32 @@
 import json
 import os
 import platform
+import shutil
 import tempfile
 from datetime import datetime
-
-from ytdlpg.options import default_download_path
+from importlib import metadata
+
+from ytdlpg import startup
+from ytdlpg.bandwidth import format_rate, parse_rate, parse_schedule
+from ytdlpg.options import (
+    OPTION_NAMES,
+    default_download_path,
+    default_event_log_path,
+)
+from ytdlpg.layout import OUTPUT_TEMPLATES, check_template
 from ytdlpg.manager import DownloadManager
+from ytdlpg.progress import ProgressAggregator
+from ytdlpg.urls import parse_urls, read_url_file
+from ytdlpg.virtual_list import VirtualList
 
 import flet as ft
-import yt_dlp
+
+
+def yt_dlp_version():
+    try:
+        return metadata.version("yt-dlp")
+    except metadata.PackageNotFoundError:
+        return "unknown"
 
 
 def main(page: ft.Page):
@@ -23,214 +41,396 @@ def main(page: ft.Page):
 
     download_manager = DownloadManager(page)
 
+    # Dialogs and file pickers are only built the first time they are needed.
+    lazy_controls = {}
+
+    def lazy_control(name, build):
+        if name not in lazy_controls:
+            lazy_controls[name] = build()
+        return lazy_controls[name]
+
+    def add_overlay(control):
+        page.overlay.append(control)
+        page.update()
+        return control
+
     url_field = ft.TextField(
-        label="Enter YouTube URL",
+        label="Enter YouTube URLs, one per line",
         autofocus=True,
+        multiline=True,
+        min_lines=1,
+        max_lines=4,
+        shift_enter=True,
         expand=True,
         border_color=ft.Colors.BLUE_400,
         focused_border_color=ft.Colors.BLUE_ACCENT,
         hint_text="https://www.youtube.com/watch?v=...",
     )
 
-    active_downloads = ft.Column(spacing=10, scroll=ft.ScrollMode.AUTO)
+    # Both tabs are virtualized: a fixed pool of row controls is re-bound to
+    # whichever downloads are scrolled into view.
+    download_row_extent = 130
+    history_row_extent = 150
+    list_height = 280
 
-    download_history = ft.Column(spacing=10, scroll=ft.ScrollMode.AUTO)
+    # Past downloads are read from the history store a page at a time as
+    # the list is scrolled, and at most `history_cap` rows are kept in
+    # memory; the rows furthest from the viewport are dropped and read
+    # again from the store when scrolled back to.
+    history_page_size = 50
+    history_cap = 1000
 
-    status_text = ft.Text("Ready to download", color=ft.Colors.GREEN)
+    # Choices offered for global and per-download speed limits (bytes/s).
+    job_rate_limits = [0] + [parse_rate(r) for r in ("256K", "512K", "1M", "2M", "5M")]
 
-    stats_row = ft.Row(
-        [ft.Text("Total Downloads: 0"), ft.Text("Completed: 0"), ft.Text("Failed: 0")],
-        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-    )
+    def build_download_row():
+        progress = ft.ProgressBar(width=800, value=0, color=ft.Colors.BLUE)
+        url_text = ft.Text(size=14, overflow=ft.TextOverflow.ELLIPSIS)
+        info_text = ft.Text(size=14, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS)
 
-    def update_stats():
-        completed = len(
-            [
-                d
-                for d in download_manager.downloads_history
-                if d["status"] == "completed"
-            ]
+        cancel_btn = ft.IconButton(
+            icon=ft.Icons.CANCEL_OUTLINED,
+            icon_color=ft.Colors.RED_400,
+            tooltip="Cancel download",
+            on_click=lambda e: cancel_download(row.data["item"]),
+        )
+
+        pause_btn = ft.IconButton(
+            icon=ft.Icons.PAUSE_CIRCLE_OUTLINE,
+            tooltip="Pause / resume",
+            on_click=lambda e: toggle_pause(row.data["item"]),
+        )
+
+        limit_menu = ft.PopupMenuButton(
+            icon=ft.Icons.SPEED,
+            tooltip="Speed limit for this download",
+            items=[
+                ft.PopupMenuItem(
+                    text=format_rate(rate),
+                    on_click=lambda e, rate=rate: set_job_rate_limit(
+                        row.data["item"], rate
+                    ),
+                )
+                for rate in job_rate_limits
+            ],
         )
-        failed = len(
-            [d for d in download_manager.downloads_history if d["status"] == "error"]
+
+        row = ft.Container(
+            content=ft.Card(
+                content=ft.Container(
+                    content=ft.Column(
+                        [
+                            ft.Row(
+                                [
+                                    ft.Icon(
+                                        ft.Icons.DOWNLOADING, color=ft.Colors.BLUE
+                                    ),
+                                    url_text,
+                                    ft.Row(
+                                        [limit_menu, pause_btn, cancel_btn],
+                                        spacing=0,
+                                    ),
+                                ],
+                                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                            ),
+                            progress,
+                            info_text,
+                        ],
+                        spacing=10,
+                    ),
+                    padding=15,
+                ),
+            ),
+            height=download_row_extent,
+            data={
+                "item": None,
+                "url": url_text,
+                "progress": progress,
+                "info": info_text,
+                "pause": pause_btn,
+                "limit": limit_menu,
+            },
         )
-        total = len(download_manager.current_downloads) + len(
-            download_manager.downloads_history
+        return row
+
+    def bind_download_row(row, download_info):
+        controls = row.data
+        status = download_info["status"]
+
+        controls["url"].value = download_info["url"]
+        controls["pause"].visible = status in (
+            "queued",
+            "paused",
+            "downloading",
+        ) and not download_info.get("playlist")
+        controls["pause"].icon = (
+            ft.Icons.PLAY_CIRCLE_OUTLINE
+            if status == "paused"
+            else ft.Icons.PAUSE_CIRCLE_OUTLINE
         )
 
-        stats_row.controls[0].value = f"Total Downloads: {total}"
-        stats_row.controls[1].value = f"Completed: {completed}"
-        stats_row.controls[2].value = f"Failed: {failed}"
-        page.update()
+        controls["limit"].visible = status in (
+            "queued",
+            "paused",
+            "downloading",
+        ) and not download_info.get("playlist")
 
-    def on_progress(download_info):
-        def find_download_card():
-            for control in active_downloads.controls:
-                if control.data == download_info["url"]:
-                    return control
-            return None
-
-        card = find_download_card()
-        if card:
-            progress_bar = card.content.content.controls[1]
-            info_text = card.content.content.controls[2]
-
-            progress_bar.value = download_info["progress"] / 100
-            status = download_info["status"]
+        # Post-processing reports no progress of its own.
+        controls["progress"].value = (
+            None if status == "processing" else download_info["progress"] / 100
+        )
+        speed_str = (
+            f" - {format_size(download_info.get('speed', 0))}/s"
+            if "speed" in download_info
+            else ""
+        )
+        if "throughput" in download_info:
+            speed_str = f" - {format_size(download_info['throughput'])}/s"
+            if download_info.get("bandwidth_limit"):
+                speed_str += (
+                    f" (limit {format_size(download_info['bandwidth_limit'])}/s)"
+                )
+        elif download_info.get("rate_limit"):
+            speed_str += f" - limit {format_size(download_info['rate_limit'])}/s"
+        if status == "queued" and "retry_at" in download_info:
+            wait = (download_info["retry_at"] - datetime.now()).total_seconds()
             speed_str = (
-                f" - {format_size(download_info.get('speed', 0))}/s"
-                if "speed" in download_info
-                else ""
+                f" - retry {download_info['retry']}"
+                f"/{download_manager.options.max_retries}"
+                f" in {max(0, round(wait))}s"
+                f" ({download_info['error_class'].replace('_', ' ')})"
             )
-            info_text.value = (
-                f"{download_info['title']} - {status.capitalize()}{speed_str}"
+        if status == "queued" and "waiting_for_space" in download_info:
+            needed = download_info["waiting_for_space"]
+            speed_str = " - waiting for disk space"
+            if needed:
+                speed_str += f" ({format_size(needed)} needed)"
+        if "playlist_total" in download_info:
+            speed_str = (
+                f" - {download_info['playlist_done']}"
+                f"/{download_info['playlist_total']} items"
             )
-            page.update()
-
-    def on_complete(download_info):
-        def find_download_card():
-            for control in active_downloads.controls:
-                if control.data == download_info["url"]:
-                    return control
-            return None
-
-        card = find_download_card()
-        if card:
-            active_downloads.controls.remove(card)
-
-            history_card = create_history_card(download_info)
-            download_history.controls.insert(0, history_card)
-
-            status_text.value = f"Download completed: {download_info['title']}"
-            status_text.color = ft.Colors.GREEN
-            update_stats()
-            page.update()
-
-    def on_error(download_info, error_message):
-        def find_download_card():
-            for control in active_downloads.controls:
-                if control.data == download_info["url"]:
-                    return control
-            return None
-
-        card = find_download_card()
-        if card:
-            active_downloads.controls.remove(card)
-
-            history_card = create_history_card(download_info)
-            download_history.controls.insert(0, history_card)
-
-            status_text.value = f"Download failed: {error_message}"
-            status_text.color = ft.Colors.RED
-            update_stats()
-            page.update()
+        controls["info"].value = (
+            f"{download_info['title']} - {status.capitalize()}{speed_str}"
+        )
 
-    def create_download_card(download_info):
-        progress = ft.ProgressBar(width=800, value=0, color=ft.Colors.BLUE)
-        info_text = ft.Text(
-            f"{download_info['title']} - {download_info['status'].capitalize()}",
-            size=14,
+    def build_history_row():
+        icon = ft.Icon()
+        title_text = ft.Text(
+            size=16,
+            weight=ft.FontWeight.BOLD,
+            max_lines=1,
+            overflow=ft.TextOverflow.ELLIPSIS,
+        )
+        url_text = ft.Text(size=12, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS)
+        status_label = ft.Text()
+        error_text = ft.Text(
+            color=ft.Colors.RED, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS
         )
 
-        cancel_btn = ft.IconButton(
-            icon=ft.Icons.CANCEL_OUTLINED,
-            icon_color=ft.Colors.RED_400,
-            tooltip="Cancel download",
-            on_click=lambda e: cancel_download(download_info),
+        open_folder_btn = ft.IconButton(
+            icon=ft.Icons.FOLDER_OPEN,
+            tooltip="Open folder",
+            on_click=lambda e: open_download_folder(row.data["item"]["path"]),
         )
 
-        card = ft.Card(
-            content=ft.Container(
-                content=ft.Column(
-                    [
-                        ft.Row(
-                            [
-                                ft.Icon(ft.Icons.DOWNLOADING, color=ft.Colors.BLUE),
-                                ft.Text(
-                                    download_info["url"],
-                                    size=14,
-                                    overflow=ft.TextOverflow.ELLIPSIS,
-                                ),
-                                cancel_btn,
-                            ],
-                            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                        ),
-                        progress,
-                        info_text,
-                    ],
-                    spacing=10,
+        row = ft.Container(
+            content=ft.Card(
+                content=ft.Container(
+                    content=ft.Column(
+                        [
+                            ft.Row(
+                                [icon, title_text],
+                                alignment=ft.MainAxisAlignment.START,
+                            ),
+                            ft.Row([url_text]),
+                            ft.Row(
+                                [status_label, open_folder_btn],
+                                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                            ),
+                            error_text,
+                        ],
+                        spacing=5,
+                    ),
+                    padding=15,
                 ),
-                padding=15,
             ),
-            data=download_info["url"],
+            height=history_row_extent,
+            data={
+                "item": None,
+                "icon": icon,
+                "title": title_text,
+                "url": url_text,
+                "status": status_label,
+                "error": error_text,
+            },
         )
-        return card
+        return row
 
-    def create_history_card(download_info):
+    def bind_history_row(row, download_info):
+        controls = row.data
         if download_info["status"] == "completed":
-            icon = ft.Icon(ft.Icons.CHECK_CIRCLE, color=ft.Colors.GREEN)
+            controls["icon"].name = ft.Icons.CHECK_CIRCLE
+            controls["icon"].color = ft.Colors.GREEN
             status_color = ft.Colors.GREEN
+        elif download_info["status"] == "skipped":
+            controls["icon"].name = ft.Icons.SKIP_NEXT
+            controls["icon"].color = ft.Colors.GREY
+            status_color = ft.Colors.GREY
         else:
-            icon = ft.Icon(ft.Icons.ERROR, color=ft.Colors.RED)
+            controls["icon"].name = ft.Icons.ERROR
+            controls["icon"].color = ft.Colors.RED
             status_color = ft.Colors.RED
 
         duration = ""
         if "start_time" in download_info and "end_time" in download_info:
             delta = download_info["end_time"] - download_info["start_time"]
             duration = f" ({delta.seconds}s)"
+            if "processing_time" in download_info:
+                duration = (
+                    f" ({delta.seconds}s: {download_info['download_time']:.0f}s"
+                    f" download, {download_info['processing_time']:.0f}s processing)"
+                )
 
-        open_folder_btn = ft.IconButton(
-            icon=ft.Icons.FOLDER_OPEN,
-            tooltip="Open folder",
-            on_click=lambda e: open_download_folder(download_info["path"]),
+        controls["title"].value = download_info.get("title", "Unknown")
+        controls["url"].value = download_info["url"]
+        controls["status"].value = (
+            f"Status: {download_info['status'].capitalize()}{duration}"
+        )
+        controls["status"].color = status_color
+        if "duplicate_of" in download_info:
+            controls["error"].value = f"Duplicate of {download_info['duplicate_of']}"
+            controls["error"].color = ft.Colors.ORANGE
+        else:
+            controls["error"].value = download_info.get("error", "")
+            controls["error"].color = ft.Colors.RED
+        controls["error"].visible = (
+            "error" in download_info or "duplicate_of" in download_info
         )
 
-        card = ft.Card(
-            content=ft.Container(
-                content=ft.Column(
-                    [
-                        ft.Row(
-                            [
-                                icon,
-                                ft.Text(
-                                    download_info["title"],
-                                    size=16,
-                                    weight=ft.FontWeight.BOLD,
-                                    overflow=ft.TextOverflow.ELLIPSIS,
-                                ),
-                            ],
-                            alignment=ft.MainAxisAlignment.START,
-                        ),
-                        ft.Row(
-                            [
-                                ft.Text(
-                                    download_info["url"],
-                                    size=12,
-                                    overflow=ft.TextOverflow.ELLIPSIS,
-                                ),
-                            ]
-                        ),
-                        ft.Row(
-                            [
-                                ft.Text(
-                                    f"Status: {download_info['status'].capitalize()}{duration}",
-                                    color=status_color,
-                                ),
-                                open_folder_btn,
-                            ],
-                            alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                        ),
-                        ft.Text(download_info.get("error", ""), color=ft.Colors.RED)
-                        if "error" in download_info
-                        else ft.Container(),
-                    ],
-                    spacing=5,
-                ),
-                padding=15,
-            ),
-            data=download_info["url"],
+    def load_history_page():
+        oldest = download_history.items[-1]["history_id"] if download_history else None
+        return download_manager.history.page(
+            before_id=oldest, limit=history_page_size
+        )
+
+    def load_newer_history_page():
+        return download_manager.history.page(
+            after_id=download_history.items[0]["history_id"],
+            limit=history_page_size,
+        )
+
+    active_downloads = VirtualList(
+        build_download_row,
+        bind_download_row,
+        item_extent=download_row_extent,
+        height=list_height,
+    )
+
+    download_history = VirtualList(
+        build_history_row,
+        bind_history_row,
+        item_extent=history_row_extent,
+        height=list_height,
+        key=lambda item: item["history_id"],
+        on_end_reached=load_history_page,
+        on_start_reached=load_newer_history_page,
+        max_items=history_cap,
+    )
+
+    def add_history_row(download_info):
+        # When the newest rows were dropped, this one comes back with them.
+        if not download_history.trimmed_start:
+            download_history.insert(0, download_info)
+
+    status_text = ft.Text("Ready to download", color=ft.Colors.GREEN)
+
+    stats_row = ft.Row(
+        [
+            ft.Text("Total Downloads: 0"),
+            ft.Text("Completed: 0"),
+            ft.Text("Failed: 0"),
+            ft.Text("Queued: 0"),
+            ft.Text("Throughput: 0 B/s"),
+            ft.Text("", visible=False),
+        ],
+        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+    )
+
+    def update_stats():
+        history = download_manager.history
+        completed = history.count("completed")
+        failed = history.count("error")
+        total = len(download_manager.current_downloads) + history.count()
+
+        stats_row.controls[0].value = f"Total Downloads: {total}"
+        stats_row.controls[1].value = f"Completed: {completed}"
+        stats_row.controls[2].value = f"Failed: {failed}"
+        stats_row.controls[3].value = f"Queued: {download_manager.queued_count()}"
+        update_throughput()
+
+        progress_stats = progress_aggregator.stats()
+        cache_stats = download_manager.info_cache.stats()
+        stats_row.controls[5].visible = download_manager.options.verbose
+        stats_row.controls[5].value = (
+            f"Progress events: {progress_stats['received']} "
+            f"(coalesced {progress_stats['coalesced']}, "
+            f"{progress_stats['flushes']} UI flushes) | "
+            f"Info cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"
+            " | Avg "
+            + ", ".join(
+                f"{stage.replace('_', ' ')} {seconds:.1f}s"
+                for stage, seconds in download_manager.stage_means().items()
+            )
         )
-        return card
+        page.update()
+
+    def update_throughput():
+        text = f"Throughput: {format_size(download_manager.throughput())}/s"
+        limit = download_manager.current_rate_limit()
+        if limit:
+            text += f" of {format_size(limit)}/s"
+        stats_row.controls[4].value = text
+
+    def on_progress(download_info):
+        progress_aggregator.submit(download_info["id"], download_info)
+
+    def flush_progress(batch):
+        changed = []
+        for download_info in batch:
+            row = active_downloads.refresh(download_info["id"])
+            if row:
+                changed.append(row)
+        if changed:
+            update_throughput()
+            page.update(*changed, stats_row.controls[4])
+
+    progress_aggregator = ProgressAggregator(flush_progress)
+
+    def remove_download_row(download_id):
+        progress_aggregator.discard(download_id)
+        return active_downloads.remove(download_id) is not None
+
+    def on_complete(download_info):
+        if remove_download_row(download_info["id"]):
+            add_history_row(download_info)
+
+            if download_info["status"] == "skipped":
+                status_text.value = f"Already downloaded: {download_info['title']}"
+            else:
+                status_text.value = f"Download completed: {download_info['title']}"
+            status_text.color = ft.Colors.GREEN
+            update_stats()
+            page.update()
+
+    def on_error(download_info, error_message):
+        if remove_download_row(download_info["id"]):
+            add_history_row(download_info)
+
+            status_text.value = f"Download failed: {error_message}"
+            status_text.color = ft.Colors.RED
+            update_stats()
+            page.update()
 
     def open_download_folder(path):
         if os.path.exists(path):
@@ -244,7 +444,7 @@ def main(page: ft.Page):
     def format_size(bytes_size):
         try:
             if bytes_size < 1024:
-                return f"{bytes_size} B"
+                return f"{int(bytes_size)} B"
             elif bytes_size < 1024 * 1024:
                 return f"{bytes_size / 1024:.1f} KB"
             elif bytes_size < 1024 * 1024 * 1024:
@@ -254,22 +454,40 @@ def main(page: ft.Page):
         except Exception:
             return "Unknown"
 
+    def show_row_status(download_info, text):
+        row = active_downloads.refresh(download_info["id"])
+        if row:
+            row.data["info"].value = f"{download_info['title']} - {text}"
+            row.update()
+
+    def toggle_pause(download_info):
+        if download_info["status"] == "paused":
+            download_manager.resume(download_info["id"])
+        else:
+            if download_info["status"] == "downloading":
+                show_row_status(download_info, "Pausing...")
+            download_manager.pause(download_info["id"])
+        update_stats()
+
+    def set_job_rate_limit(download_info, rate_limit):
+        download_manager.set_rate_limit(download_info["id"], rate_limit)
+        row = active_downloads.refresh(download_info["id"])
+        if row:
+            row.update()
+
     def cancel_download(download_info):
-        for control in active_downloads.controls[:]:
-            if control.data == download_info["url"]:
-                active_downloads.controls.remove(control)
+        show_row_status(download_info, "Cancelling...")
 
-                download_info["status"] = "cancelled"
-                download_info["end_time"] = datetime.now()
+        # Blocks this event handler until the worker has actually stopped.
+        download_manager.cancel(download_info["id"])
 
-                history_card = create_history_card(download_info)
-                download_history.controls.insert(0, history_card)
+        if remove_download_row(download_info["id"]):
+            add_history_row(download_info)
 
-                status_text.value = f"Download cancelled: {download_info['title']}"
-                status_text.color = ft.Colors.ORANGE
-                update_stats()
-                page.update()
-                break
+            status_text.value = f"Download cancelled: {download_info['title']}"
+            status_text.color = ft.Colors.ORANGE
+            update_stats()
+            page.update()
 
     format_dropdown = ft.Dropdown(
         width=200,
@@ -277,9 +495,9 @@ def main(page: ft.Page):
         options=[
             ft.dropdown.Option("best", "Best Quality"),
             ft.dropdown.Option("bestvideo+bestaudio", "Best Video + Audio"),
-            ft.dropdown.Option("136+140", "720p + Audio"),
-            ft.dropdown.Option("135+140", "480p + Audio"),
-            ft.dropdown.Option("134+140", "360p + Audio"),
+            ft.dropdown.Option("bv*[height<=720]+ba/b[height<=720]", "720p + Audio"),
+            ft.dropdown.Option("bv*[height<=480]+ba/b[height<=480]", "480p + Audio"),
+            ft.dropdown.Option("bv*[height<=360]+ba/b[height<=360]", "360p + Audio"),
         ],
         value="best",
     )
@@ -325,16 +543,73 @@ def main(page: ft.Page):
         read_only=True,
     )
 
+    output_template_field = ft.TextField(
+        label="File Name Template",
+        value=download_manager.options.output_template,
+        expand=True,
+    )
+
+    layout_dropdown = ft.Dropdown(
+        width=180,
+        label="Layout",
+        options=[
+            ft.dropdown.Option(template, name)
+            for name, template in OUTPUT_TEMPLATES.items()
+        ],
+        value=download_manager.options.output_template,
+    )
+
+    def on_layout_change(e):
+        output_template_field.value = layout_dropdown.value
+        output_template_field.error_text = None
+        page.update()
+
+    def on_template_change(e):
+        try:
+            check_template(output_template_field.value)
+            output_template_field.error_text = None
+        except ValueError as ex:
+            output_template_field.error_text = str(ex)
+        # Shows "Layout" empty for a custom template.
+        layout_dropdown.value = output_template_field.value
+        page.update()
+
+    layout_dropdown.on_change = on_layout_change
+    output_template_field.on_blur = on_template_change
+    output_template_field.on_submit = on_template_change
+
+    # In-progress files go here and are moved to the output directory when
+    # done, e.g. a local disk in front of a slow network share.
+    staging_path_field = ft.TextField(
+        label="Staging Directory",
+        hint_text="Empty writes straight to the output directory",
+        value=download_manager.options.staging_path,
+        expand=True,
+    )
+
+    min_free_space_dropdown = ft.Dropdown(
+        width=150,
+        label="Keep Free",
+        options=[
+            ft.dropdown.Option(str(size), format_size(size) if size else "Nothing")
+            for size in (0, 256 * 1024**2, 1024**3, 5 * 1024**3, 20 * 1024**3)
+        ],
+        value=str(download_manager.options.min_free_space),
+    )
+
     def on_directory_result(e: ft.FilePickerResultEvent):
         if e.path:
             output_path_field.value = e.path
-            download_manager.options.output_path = e.path
+            download_manager.options = download_manager.options.replace(
+                output_path=e.path
+            )
             page.update()
 
-    directory_picker = ft.FilePicker(on_result=on_directory_result)
-    page.overlay.append(directory_picker)
-
     def pick_directory(e):
+        directory_picker = lazy_control(
+            "directory_picker",
+            lambda: add_overlay(ft.FilePicker(on_result=on_directory_result)),
+        )
         directory_picker.get_directory_path(
             initial_directory=download_manager.options.output_path,
         )
@@ -366,48 +641,312 @@ def main(page: ft.Page):
 
     verbose_switch = ft.Switch(label="Verbose Output", value=False)
 
+    archive_switch = ft.Switch(
+        label="Skip Already Downloaded",
+        value=download_manager.options.use_archive,
+    )
+    dedupe_switch = ft.Switch(
+        label="Detect Duplicate Files",
+        value=download_manager.options.dedupe_files,
+    )
+
+    max_concurrent_dropdown = ft.Dropdown(
+        width=150,
+        label="Parallel Downloads",
+        options=[ft.dropdown.Option(str(n)) for n in (1, 2, 3, 4, 6, 8)],
+        value=str(download_manager.options.max_concurrent),
+    )
+
+    per_host_limit_dropdown = ft.Dropdown(
+        width=150,
+        label="Per-Site Limit",
+        options=[ft.dropdown.Option("0", "Unlimited")]
+        + [ft.dropdown.Option(str(n)) for n in (1, 2, 3, 4)],
+        value=str(download_manager.options.per_host_limit),
+    )
+
+    max_retries_dropdown = ft.Dropdown(
+        width=150,
+        label="Retries",
+        options=[ft.dropdown.Option("0", "Off")]
+        + [ft.dropdown.Option(str(n)) for n in (1, 2, 3, 5, 10)],
+        value=str(download_manager.options.max_retries),
+    )
+
+    # yt-dlp in separate processes keeps a crashing or hanging extractor, and
+    # its CPU work, away from the UI.
+    process_mode_switch = ft.Switch(
+        label="Run Downloads in Separate Processes",
+        value=download_manager.options.execution_mode == "process",
+    )
+
+    rate_limit_dropdown = ft.Dropdown(
+        width=150,
+        label="Speed Limit",
+        options=[
+            ft.dropdown.Option(str(rate), format_rate(rate))
+            for rate in job_rate_limits + [parse_rate("10M")]
+        ],
+        value=str(download_manager.options.rate_limit),
+    )
+
+    rate_schedule_field = ft.TextField(
+        label="Limit Schedule",
+        hint_text="09:00-18:00=1M, 23:00-07:00=0",
+        value=download_manager.options.rate_schedule,
+        expand=True,
+    )
+
+    def on_bandwidth_change(e):
+        try:
+            parse_schedule(rate_schedule_field.value)
+            rate_schedule_field.error_text = None
+        except ValueError as ex:
+            rate_schedule_field.error_text = str(ex)
+            page.update()
+            return
+        download_manager.options = download_manager.options.replace(
+            rate_limit=int(rate_limit_dropdown.value),
+            rate_schedule=rate_schedule_field.value,
+        )
+        download_manager.shaper.rebalance()
+        update_stats()
+
+    rate_limit_dropdown.on_change = on_bandwidth_change
+    rate_schedule_field.on_blur = on_bandwidth_change
+    rate_schedule_field.on_submit = on_bandwidth_change
+
+    fragments_dropdown = ft.Dropdown(
+        width=150,
+        label="Parallel Fragments",
+        options=[ft.dropdown.Option(str(n)) for n in (1, 2, 4, 8, 16)],
+        value=str(download_manager.options.concurrent_fragments),
+    )
+
+    chunk_size_dropdown = ft.Dropdown(
+        width=150,
+        label="HTTP Chunk Size",
+        options=[ft.dropdown.Option("0", "Off")]
+        + [
+            ft.dropdown.Option(str(parse_rate(size)), size)
+            for size in ("1M", "10M", "50M")
+        ],
+        value=str(download_manager.options.http_chunk_size),
+    )
+
+    buffer_size_dropdown = ft.Dropdown(
+        width=150,
+        label="Buffer Size",
+        options=[ft.dropdown.Option("0", "Auto")]
+        + [
+            ft.dropdown.Option(str(parse_rate(size)), size)
+            for size in ("16K", "64K", "1M")
+        ],
+        value=str(download_manager.options.buffer_size),
+    )
+
+    downloader_dropdown = ft.Dropdown(
+        width=150,
+        label="Downloader",
+        options=[
+            ft.dropdown.Option("", "Built-in"),
+            ft.dropdown.Option(
+                "aria2c", "aria2c", disabled=shutil.which("aria2c") is None
+            ),
+        ],
+        value=download_manager.options.external_downloader,
+    )
+
+    connections_dropdown = ft.Dropdown(
+        width=150,
+        label="Connections",
+        options=[ft.dropdown.Option(str(n)) for n in (1, 4, 8, 16)],
+        value=str(download_manager.options.external_connections),
+        disabled=not downloader_dropdown.value,
+    )
+
+    def on_downloader_change(e):
+        connections_dropdown.disabled = not downloader_dropdown.value
+        page.update()
+
+    downloader_dropdown.on_change = on_downloader_change
+
+    metrics_port_field = ft.TextField(
+        label="Metrics Port",
+        hint_text="0 = off",
+        value=str(download_manager.options.metrics_port),
+        width=150,
+        keyboard_type=ft.KeyboardType.NUMBER,
+    )
+
+    event_log_switch = ft.Switch(
+        label="Write Event Log",
+        value=bool(download_manager.options.event_log),
+    )
+
+    def on_telemetry_change(e):
+        try:
+            port = int(metrics_port_field.value or 0)
+        except ValueError:
+            metrics_port_field.error_text = "Not a number"
+            page.update()
+            return
+        metrics_port_field.error_text = None
+        download_manager.options = download_manager.options.replace(
+            metrics_port=port,
+            event_log=default_event_log_path if event_log_switch.value else "",
+        )
+        try:
+            download_manager.configure_telemetry()
+        except OSError as ex:
+            status_text.value = f"Could not start metrics endpoint: {ex}"
+            status_text.color = ft.Colors.RED
+        else:
+            if port:
+                status_text.value = f"Metrics at http://127.0.0.1:{port}/metrics"
+                status_text.color = ft.Colors.GREEN
+        page.update()
+
+    metrics_port_field.on_blur = on_telemetry_change
+    metrics_port_field.on_submit = on_telemetry_change
+    event_log_switch.on_change = on_telemetry_change
+
     def update_options():
-        download_manager.options.format = format_dropdown.value
-        download_manager.options.output_path = output_path_field.value
-        download_manager.options.extract_audio = extract_audio_switch.value
-        download_manager.options.audio_format = audio_format_dropdown.value
-        download_manager.options.audio_quality = audio_quality_dropdown.value
-        download_manager.options.playlist = playlist_switch.value
-        download_manager.options.subtitles = subtitles_switch.value
-        download_manager.options.subtitle_lang = subtitle_lang_dropdown.value
-        download_manager.options.thumbnail = thumbnail_switch.value
-        download_manager.options.verbose = verbose_switch.value
+        # Jobs keep the options they were queued with; this only affects
+        # jobs queued from now on.
+        changes = dict(
+            format=format_dropdown.value,
+            output_path=output_path_field.value,
+            staging_path=staging_path_field.value.strip(),
+            min_free_space=int(min_free_space_dropdown.value),
+            extract_audio=extract_audio_switch.value,
+            audio_format=audio_format_dropdown.value,
+            audio_quality=audio_quality_dropdown.value,
+            playlist=playlist_switch.value,
+            subtitles=subtitles_switch.value,
+            subtitle_lang=subtitle_lang_dropdown.value,
+            thumbnail=thumbnail_switch.value,
+            verbose=verbose_switch.value,
+            use_archive=archive_switch.value,
+            dedupe_files=dedupe_switch.value,
+            max_concurrent=int(max_concurrent_dropdown.value),
+            per_host_limit=int(per_host_limit_dropdown.value),
+            max_retries=int(max_retries_dropdown.value),
+            execution_mode="process" if process_mode_switch.value else "thread",
+            concurrent_fragments=int(fragments_dropdown.value),
+            http_chunk_size=int(chunk_size_dropdown.value),
+            buffer_size=int(buffer_size_dropdown.value),
+            external_downloader=downloader_dropdown.value,
+            external_connections=int(connections_dropdown.value),
+            rate_limit=int(rate_limit_dropdown.value),
+        )
+        if rate_schedule_field.error_text is None:
+            changes["rate_schedule"] = rate_schedule_field.value
+        if output_template_field.error_text is None:
+            changes["output_template"] = output_template_field.value
+        download_manager.options = download_manager.options.replace(**changes)
+
+    # While a bulk add runs, new rows are collected and added in one go.
+    queued_batch = {"items": None}
+
+    def on_queued(download_info):
+        if queued_batch["items"] is not None:
+            queued_batch["items"].append(download_info)
+        else:
+            active_downloads.insert(len(active_downloads), download_info)
+
+    def enqueue_download(url, format=None, info=None):
+        return download_manager.download(
+            url,
+            on_progress,
+            on_complete,
+            on_error,
+            on_queued=on_queued,
+            format=format,
+            info=info,
+        )
+
+    def urls_from_field():
+        text = url_field.value.strip()
+        urls, duplicates = parse_urls(text)
+        if not urls and text and "\n" not in text:
+            # Not a link (a bare video ID, ytsearch:...); pass it on as typed.
+            urls = [text]
+        return urls, duplicates
+
+    def enqueue_many(urls, duplicates=0):
+        update_options()
+        queued_batch["items"] = []
+        try:
+            added = download_manager.download_many(
+                urls, on_progress, on_complete, on_error, on_queued=on_queued
+            )
+        finally:
+            rows, queued_batch["items"] = queued_batch["items"], None
+        active_downloads.extend(rows)
+
+        skipped = [info for info in added if info["status"] == "skipped"]
+        for download_info in skipped:
+            add_history_row(download_info)
+        duplicates += len(urls) - len(added)
+        status_text.value = f"Queued {len(added) - len(skipped)} download(s)"
+        if skipped:
+            status_text.value += f", {len(skipped)} already downloaded"
+        if duplicates:
+            status_text.value += f", {duplicates} duplicate(s) skipped"
+        status_text.color = ft.Colors.BLUE
+        update_stats()
+        page.update()
 
     def start_download(e):
-        url = url_field.value.strip()
-        if not url:
+        urls, duplicates = urls_from_field()
+        if not urls:
             status_text.value = "Please enter a valid URL"
             status_text.color = ft.Colors.RED
             page.update()
             return
 
+        url_field.value = ""
+        if len(urls) > 1:
+            enqueue_many(urls, duplicates)
+            return
+
         update_options()
+        download_info = enqueue_download(urls[0])
 
-        download_info = {
-            "url": url,
-            "start_time": datetime.now(),
-            "status": "initializing",
-            "progress": 0,
-            "title": "Initializing...",
-            "path": download_manager.options.output_path,
-        }
+        if download_info["status"] == "skipped":
+            add_history_row(download_info)
+            status_text.value = f"Already downloaded: {download_info['title']}"
+            status_text.color = ft.Colors.ORANGE
+        else:
+            status_text.value = "Download queued"
+            status_text.color = ft.Colors.BLUE
+        update_stats()
+        page.update()
 
-        download_card = create_download_card(download_info)
-        active_downloads.controls.append(download_card)
+    url_field.on_submit = start_download
 
-        url_field.value = ""
+    def retry_failed(e):
+        urls = download_manager.failed_urls()
+        if not urls:
+            status_text.value = "No failed downloads to retry"
+            status_text.color = ft.Colors.ORANGE
+            page.update()
+            return
 
-        status_text.value = "Starting download..."
+        update_options()
+        for url in urls:
+            download_info = enqueue_download(url)
+            if download_info["status"] == "skipped":
+                add_history_row(download_info)
+        status_text.value = f"Retrying {len(urls)} failed download(s)"
         status_text.color = ft.Colors.BLUE
         update_stats()
         page.update()
 
-        download_manager.download(url, on_progress, on_complete, on_error)
+    retry_failed_button = ft.TextButton(
+        "Retry Failed", icon=ft.Icons.REPLAY, on_click=retry_failed
+    )
 
     download_button = ft.ElevatedButton(
         text="Download",
@@ -418,14 +957,167 @@ def main(page: ft.Page):
         height=50,
     )
 
+    def describe_format(f):
+        if f.get("vcodec") == "none":
+            resolution = "audio only"
+        else:
+            resolution = f.get("resolution") or f"{f.get('height', '?')}p"
+        size = f.get("filesize") or f.get("filesize_approx")
+        size_str = format_size(size) if size else "size unknown"
+        note = f" ({f['format_note']})" if f.get("format_note") else ""
+        ext = f.get("ext", "?")
+        return f"{f['format_id']} - {ext} - {resolution} - {size_str}{note}"
+
+    def format_selector(f):
+        # Video-only streams need an audio stream merged in.
+        if f.get("acodec") == "none" and f.get("vcodec") != "none":
+            return f"{f['format_id']}+bestaudio/{f['format_id']}"
+        return f["format_id"]
+
+    probed_format = {"url": None, "info": None}
+    format_choices = ft.RadioGroup(content=ft.Column(scroll=ft.ScrollMode.AUTO))
+
+    def on_formats_probed(url, future):
+        try:
+            info = future.result()
+        except Exception as e:
+            status_text.value = f"Could not fetch formats: {str(e)}"
+            status_text.color = ft.Colors.RED
+            page.update()
+            return
+
+        formats = [f for f in info.get("formats") or [] if f.get("format_id")]
+        if not formats:
+            status_text.value = "No format list available for this URL"
+            status_text.color = ft.Colors.ORANGE
+            page.update()
+            return
+
+        probed_format["url"] = url
+        probed_format["info"] = info
+        # yt-dlp lists formats worst to best.
+        format_choices.content.controls = [
+            ft.Radio(value=format_selector(f), label=describe_format(f))
+            for f in reversed(formats)
+        ]
+        format_choices.value = None
+        format_dialog = lazy_control("format_dialog", build_format_dialog)
+        format_dialog.title = ft.Text(info.get("title", "Available Formats"))
+
+        status_text.value = f"{len(formats)} formats available"
+        status_text.color = ft.Colors.GREEN
+        page.open(format_dialog)
+
+    def show_formats(e):
+        urls, _ = urls_from_field()
+        if len(urls) != 1:
+            status_text.value = (
+                "Enter a single URL to choose its format"
+                if urls
+                else "Please enter a valid URL"
+            )
+            status_text.color = ft.Colors.RED
+            page.update()
+            return
+        url = urls[0]
+
+        update_options()
+        status_text.value = "Fetching available formats..."
+        status_text.color = ft.Colors.BLUE
+        page.update()
+
+        future = download_manager.probe(url)
+        future.add_done_callback(lambda future: on_formats_probed(url, future))
+
+    def download_selected_format(e):
+        close_dialog(lazy_control("format_dialog", build_format_dialog))
+        if not format_choices.value:
+            return
+
+        enqueue_download(
+            probed_format["url"],
+            format=format_choices.value,
+            info=probed_format["info"],
+        )
+        if urls_from_field()[0] == [probed_format["url"]]:
+            url_field.value = ""
+
+        status_text.value = "Download queued"
+        status_text.color = ft.Colors.BLUE
+        update_stats()
+        page.update()
+
+    def build_format_dialog():
+        format_dialog = ft.AlertDialog(
+            title=ft.Text("Available Formats"),
+            content=ft.Container(content=format_choices, width=600, height=400),
+            actions=[
+                ft.TextButton("Download", on_click=download_selected_format),
+                ft.TextButton(
+                    "Close", on_click=lambda e: close_dialog(format_dialog)
+                ),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        return format_dialog
+
+    formats_button = ft.IconButton(
+        icon=ft.Icons.VIDEO_SETTINGS,
+        tooltip="Choose format",
+        on_click=show_formats,
+    )
+
     def paste_from_clipboard(e):
         page.set_clipboard("")
         page.get_clipboard(on_clipboard_data)
 
     def on_clipboard_data(e):
         if e.data and isinstance(e.data, str):
-            url_field.value = e.data
+            # Pasting adds to what is already there, so lists can be built up.
+            current = url_field.value.strip()
+            url_field.value = f"{current}\n{e.data}" if current else e.data
+            page.update()
+
+    def on_import_urls_result(e: ft.FilePickerResultEvent):
+        if not e.files:
+            return
+        urls, duplicates = [], 0
+        try:
+            for picked in e.files:
+                file_urls, file_duplicates = read_url_file(picked.path)
+                urls += file_urls
+                duplicates += file_duplicates
+        except OSError as ex:
+            status_text.value = f"Could not read URL list: {ex}"
+            status_text.color = ft.Colors.RED
+            page.update()
+            return
+        # Files can repeat each other too.
+        merged, repeated = parse_urls("\n".join(urls))
+        if not merged:
+            status_text.value = "No URLs found in the selected file"
+            status_text.color = ft.Colors.ORANGE
             page.update()
+            return
+        enqueue_many(merged, duplicates + repeated)
+
+    def import_urls(e):
+        import_urls_picker = lazy_control(
+            "import_urls_picker",
+            lambda: add_overlay(ft.FilePicker(on_result=on_import_urls_result)),
+        )
+        import_urls_picker.pick_files(
+            dialog_title="Import URLs",
+            allowed_extensions=["txt", "csv", "list"],
+            file_type=ft.FilePickerFileType.CUSTOM,
+            allow_multiple=True,
+        )
+
+    import_urls_button = ft.IconButton(
+        icon=ft.Icons.PLAYLIST_ADD,
+        tooltip="Import URLs from a text or CSV file",
+        on_click=import_urls,
+    )
 
     paste_button = ft.IconButton(
         icon=ft.Icons.PASTE,
@@ -444,7 +1136,7 @@ def main(page: ft.Page):
     )
 
     def export_settings(e):
-        settings = vars(download_manager.options)
+        settings = download_manager.options.to_dict()
         fd = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
         with open(fd.name, "w") as f:
             json.dump(settings, f, indent=2)
@@ -466,12 +1158,22 @@ def main(page: ft.Page):
                 with open(file_path, "r") as f:
                     settings = json.load(f)
 
-                for key, value in settings.items():
-                    if hasattr(download_manager.options, key):
-                        setattr(download_manager.options, key, value)
+                download_manager.options = download_manager.options.replace(
+                    **{
+                        key: value
+                        for key, value in settings.items()
+                        if key in OPTION_NAMES
+                    }
+                )
 
                 format_dropdown.value = download_manager.options.format
                 output_path_field.value = download_manager.options.output_path
+                staging_path_field.value = download_manager.options.staging_path
+                output_template_field.value = download_manager.options.output_template
+                layout_dropdown.value = download_manager.options.output_template
+                min_free_space_dropdown.value = str(
+                    download_manager.options.min_free_space
+                )
                 extract_audio_switch.value = download_manager.options.extract_audio
                 audio_format_dropdown.value = download_manager.options.audio_format
                 audio_quality_dropdown.value = (
@@ -484,10 +1186,42 @@ def main(page: ft.Page):
                 )
                 thumbnail_switch.value = download_manager.options.thumbnail
                 verbose_switch.value = download_manager.options.verbose
+                archive_switch.value = download_manager.options.use_archive
+                dedupe_switch.value = download_manager.options.dedupe_files
+                max_concurrent_dropdown.value = str(
+                    download_manager.options.max_concurrent
+                )
+                per_host_limit_dropdown.value = str(
+                    download_manager.options.per_host_limit
+                )
+                max_retries_dropdown.value = str(download_manager.options.max_retries)
+                process_mode_switch.value = (
+                    download_manager.options.execution_mode == "process"
+                )
+                rate_limit_dropdown.value = str(download_manager.options.rate_limit)
+                rate_schedule_field.value = download_manager.options.rate_schedule
+                fragments_dropdown.value = str(
+                    download_manager.options.concurrent_fragments
+                )
+                chunk_size_dropdown.value = str(
+                    download_manager.options.http_chunk_size
+                )
+                buffer_size_dropdown.value = str(download_manager.options.buffer_size)
+                downloader_dropdown.value = (
+                    download_manager.options.external_downloader
+                )
+                connections_dropdown.value = str(
+                    download_manager.options.external_connections
+                )
+                metrics_port_field.value = str(download_manager.options.metrics_port)
+                event_log_switch.value = bool(download_manager.options.event_log)
+                download_manager.configure_telemetry()
+                download_manager.shaper.rebalance()
 
                 audio_format_dropdown.disabled = not extract_audio_switch.value
                 audio_quality_dropdown.disabled = not extract_audio_switch.value
                 subtitle_lang_dropdown.disabled = not subtitles_switch.value
+                connections_dropdown.disabled = not downloader_dropdown.value
 
                 status_text.value = "Settings imported successfully"
                 status_text.color = ft.Colors.GREEN
@@ -497,10 +1231,11 @@ def main(page: ft.Page):
                 status_text.color = ft.Colors.RED
                 page.update()
 
-    import_settings_picker = ft.FilePicker(on_result=on_import_settings_result)
-    page.overlay.append(import_settings_picker)
-
     def import_settings(e):
+        import_settings_picker = lazy_control(
+            "import_settings_picker",
+            lambda: add_overlay(ft.FilePicker(on_result=on_import_settings_result)),
+        )
         import_settings_picker.pick_files(
             allowed_extensions=["json"],
             file_type=ft.FilePickerFileType.CUSTOM,
@@ -514,7 +1249,7 @@ def main(page: ft.Page):
     )
 
     def show_about(e):
-        page.open(about_dialog)
+        page.open(lazy_control("about_dialog", build_about_dialog))
 
     def highlight_link(e):
         e.control.style.color = ft.Colors.BLUE
@@ -524,59 +1259,63 @@ def main(page: ft.Page):
         e.control.style.color = None
         e.control.update()
 
-    about_dialog = ft.AlertDialog(
-        title=ft.Text("About YT-DLP GUI"),
-        content=ft.Column(
-            [
-                ft.Text("A beautiful GUI for YT-DLP."),
-                ft.Text(
-                    spans=[
-                        ft.TextSpan(
-                            "Made with ❤️ by @Tomlin7",
-                            ft.TextStyle(decoration=ft.TextDecoration.UNDERLINE),
-                            url="https://github.com/tomlin7",
-                            on_enter=highlight_link,
-                            on_exit=unhighlight_link,
-                        )
-                    ]
-                ),
-                ft.Text("Version 1.1.0"),
-                ft.Text("yt-dlp version: " + yt_dlp.version.__version__),
+    def build_about_dialog():
+        about_dialog = ft.AlertDialog(
+            title=ft.Text("About YT-DLP GUI"),
+            content=ft.Column(
+                [
+                    ft.Text("A beautiful GUI for YT-DLP."),
+                    ft.Text(
+                        spans=[
+                            ft.TextSpan(
+                                "Made with ❤️ by @Tomlin7",
+                                ft.TextStyle(decoration=ft.TextDecoration.UNDERLINE),
+                                url="https://github.com/tomlin7",
+                                on_enter=highlight_link,
+                                on_exit=unhighlight_link,
+                            )
+                        ]
+                    ),
+                    ft.Text("Version 1.1.0"),
+                    ft.Text("yt-dlp version: " + yt_dlp_version()),
+                ],
+                tight=True,
+            ),
+            actions=[
+                ft.TextButton("Close", on_click=lambda e: close_dialog(about_dialog)),
             ],
-            tight=True,
-        ),
-        actions=[
-            ft.TextButton("Close", on_click=lambda e: close_dialog(about_dialog)),
-        ],
-        actions_alignment=ft.MainAxisAlignment.END,
-    )
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        return about_dialog
 
     def show_help(e):
-        page.open(help_dialog)
-
-    help_dialog = ft.AlertDialog(
-        modal=True,
-        title=ft.Text("Help"),
-        content=ft.Column(
-            [
-                ft.Text("How to use YT-DLP GUI:", weight=ft.FontWeight.BOLD),
-                ft.Text("1. Enter a YouTube URL in the input field"),
-                ft.Text("2. Configure download options if needed"),
-                ft.Text("3. Click the Download button"),
-                ft.Text("4. Monitor progress in the Active Downloads tab"),
-                ft.Text("5. View completed downloads in the History tab"),
-                ft.Text("\nSupported URLs:", weight=ft.FontWeight.BOLD),
-                ft.Text("- YouTube videos and playlists"),
-                ft.Text("- Other platforms supported by yt-dlp"),
+        page.open(lazy_control("help_dialog", build_help_dialog))
+
+    def build_help_dialog():
+        help_dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Help"),
+            content=ft.Column(
+                [
+                    ft.Text("How to use YT-DLP GUI:", weight=ft.FontWeight.BOLD),
+                    ft.Text("1. Enter a YouTube URL in the input field"),
+                    ft.Text("2. Configure download options if needed"),
+                    ft.Text("3. Click the Download button"),
+                    ft.Text("4. Monitor progress in the Active Downloads tab"),
+                    ft.Text("5. View completed downloads in the History tab"),
+                    ft.Text("\nSupported URLs:", weight=ft.FontWeight.BOLD),
+                    ft.Text("- YouTube videos and playlists"),
+                    ft.Text("- Other platforms supported by yt-dlp"),
+                ],
+                tight=True,
+                scroll=ft.ScrollMode.AUTO,
+            ),
+            actions=[
+                ft.TextButton("Close", on_click=lambda e: close_dialog(help_dialog)),
             ],
-            tight=True,
-            scroll=ft.ScrollMode.AUTO,
-        ),
-        actions=[
-            ft.TextButton("Close", on_click=lambda e: close_dialog(help_dialog)),
-        ],
-        actions_alignment=ft.MainAxisAlignment.END,
-    )
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        return help_dialog
 
     def close_dialog(dialog):
         page.close(dialog)
@@ -587,6 +1326,10 @@ def main(page: ft.Page):
         on_click=pick_directory,
     )
 
+    download_history.set_items(load_history_page())
+    update_stats()
+    startup.mark("ui built")
+
     page.add(
         ft.Column(
             [
@@ -624,7 +1367,9 @@ def main(page: ft.Page):
                                     [
                                         url_field,
                                         paste_button,
+                                        import_urls_button,
                                         clear_button,
+                                        formats_button,
                                         download_button,
                                     ],
                                     alignment=ft.MainAxisAlignment.CENTER,
@@ -669,6 +1414,18 @@ def main(page: ft.Page):
                                                 browse_button,
                                             ]
                                         ),
+                                        ft.Row(
+                                            [
+                                                layout_dropdown,
+                                                output_template_field,
+                                            ]
+                                        ),
+                                        ft.Row(
+                                            [
+                                                staging_path_field,
+                                                min_free_space_dropdown,
+                                            ]
+                                        ),
                                         ft.Divider(),
                                         ft.Text(
                                             "Additional Options",
@@ -681,10 +1438,55 @@ def main(page: ft.Page):
                                                 subtitle_lang_dropdown,
                                                 thumbnail_switch,
                                                 verbose_switch,
+                                                archive_switch,
+                                                dedupe_switch,
+                                            ],
+                                            wrap=True,
+                                        ),
+                                        ft.Divider(),
+                                        ft.Text("Queue", weight=ft.FontWeight.BOLD),
+                                        ft.Row(
+                                            [
+                                                max_concurrent_dropdown,
+                                                per_host_limit_dropdown,
+                                                max_retries_dropdown,
+                                                process_mode_switch,
                                             ],
                                             wrap=True,
                                         ),
                                         ft.Divider(),
+                                        ft.Text(
+                                            "Bandwidth", weight=ft.FontWeight.BOLD
+                                        ),
+                                        ft.Row(
+                                            [
+                                                rate_limit_dropdown,
+                                                rate_schedule_field,
+                                            ],
+                                        ),
+                                        ft.Divider(),
+                                        ft.Text(
+                                            "Transfer", weight=ft.FontWeight.BOLD
+                                        ),
+                                        ft.Row(
+                                            [
+                                                fragments_dropdown,
+                                                chunk_size_dropdown,
+                                                buffer_size_dropdown,
+                                                downloader_dropdown,
+                                                connections_dropdown,
+                                            ],
+                                            wrap=True,
+                                        ),
+                                        ft.Divider(),
+                                        ft.Text(
+                                            "Diagnostics", weight=ft.FontWeight.BOLD
+                                        ),
+                                        ft.Row(
+                                            [metrics_port_field, event_log_switch],
+                                            wrap=True,
+                                        ),
+                                        ft.Divider(),
                                         ft.Row(
                                             [
                                                 import_settings_button,
@@ -714,7 +1516,7 @@ def main(page: ft.Page):
                             text="Active Downloads",
                             icon=ft.Icons.DOWNLOADING,
                             content=ft.Container(
-                                content=active_downloads,
+                                content=active_downloads.view,
                                 padding=10,
                                 height=300,
                             ),
@@ -723,9 +1525,18 @@ def main(page: ft.Page):
                             text="History",
                             icon=ft.Icons.HISTORY,
                             content=ft.Container(
-                                content=download_history,
+                                content=ft.Column(
+                                    [
+                                        ft.Row(
+                                            [retry_failed_button],
+                                            alignment=ft.MainAxisAlignment.END,
+                                        ),
+                                        download_history.view,
+                                    ],
+                                    spacing=0,
+                                ),
                                 padding=10,
-                                height=300,
+                                height=340,
                             ),
                         ),
                     ],
@@ -735,6 +1546,21 @@ def main(page: ft.Page):
             ]
         )
     )
+    startup.mark("first paint")
+
+    # Pick up the jobs the last session left unfinished (closed or crashed).
+    restored = download_manager.restore(
+        on_progress, on_complete, on_error, on_queued=on_queued
+    )
+    if restored:
+        status_text.value = f"Restored {len(restored)} unfinished download(s)"
+        status_text.color = ft.Colors.BLUE
+        update_stats()
+        page.update()
+
+    # yt-dlp is only needed once a download starts; load it in the background
+    # now that the window is up.
+    download_manager.preload()
 
 
 def python_main():
@@ -1,30 +1,1359 @@
+import glob
+import heapq
+import itertools
+import os
 import threading
-from datetime import datetime
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
-import yt_dlp
+from ytdlpg import startup
+from ytdlpg.archive import (
+    ContentIndex,
+    DownloadArchive,
+    FileIndex,
+    archive_id,
+    archive_id_from_info,
+    archive_id_from_url,
+)
+from ytdlpg.bandwidth import BandwidthShaper, parse_schedule, scheduled_rate
+from ytdlpg.cache import InfoCache, cache_key
+from ytdlpg.errors import RATE_LIMITED, RETRYABLE, backoff_delay, classify
+from ytdlpg.history import HistoryStore
+from ytdlpg.journal import JobJournal
+from ytdlpg.layout import add_template_fields
+from ytdlpg.metrics import EventLog, JobMetrics, MetricsRegistry, MetricsServer
+from ytdlpg.options import YtdlpOptions, default_data_path
+from ytdlpg.playlist import PlaylistJob, entry_url
+from ytdlpg.postprocess import run_postprocessors, split_postprocessors
+from ytdlpg.storage import expected_size, free_space, move_into_place
+from ytdlpg.workers import WorkerError, WorkerPool, process_context, run_in_worker
+from ytdlpg.ydl_pool import YoutubeDLPool
 
-from ytdlpg.options import YtdlpOptions
+# yt-dlp loads its whole extractor registry on import, so it is imported on
+# first use (or by DownloadManager.preload) rather than at startup.
+_yt_dlp = None
+
+
+def load_yt_dlp():
+    global _yt_dlp
+    if _yt_dlp is None:
+        import yt_dlp
+
+        _yt_dlp = yt_dlp
+        startup.mark("yt-dlp imported")
+    return _yt_dlp
+
+
+def host_key(url):
+    host = urlparse(url).hostname or ""
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+    if host == "youtu.be":
+        host = "youtube.com"
+    return host
+
+
+# Seconds between free-space checks for a job held back by a full disk.
+SPACE_RECHECK_INTERVAL = 30
+
+
+class AlreadyDownloaded(Exception):
+    pass
+
+
+class NotEnoughSpace(Exception):
+    def __init__(self, path, needed, free):
+        super().__init__(f"Not enough free space in {path}")
+        self.path = path
+        self.needed = needed
+        self.free = free
+
+
+def _variant(job):
+    # Downloads of one video that write different files.
+    options = job.options
+    audio = options.audio_format if options.extract_audio else ""
+    return f"{job.format or options.format}|{audio}|{options.output_template}"
+
+
+def _remove_empty_dirs(directory, root):
+    # Drop the subdirectories the output template made under `root`, up to
+    # the first one that is not empty.
+    directory = os.path.abspath(directory)
+    root = os.path.abspath(root)
+    while directory != root and os.path.commonpath([directory, root]) == root:
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+class DownloadJob:
+    def __init__(self, info, priority, on_progress, on_complete, on_error):
+        self.info = info
+        self.priority = priority
+        self.format = None
+        # The options the job was queued with; see YtdlpOptions.
+        self.options = None
+        self.rate_limit = 0
+        self.probe = None
+        self.postprocess = None
+        self.parent = None
+        self.host = host_key(info["url"])
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.seq = None
+        self.journal_id = None
+        self.not_before = 0  # monotonic time before which a retry may not run
+        self.paused = False
+        self.removed = False
+        self.metrics = JobMetrics()
+        self.stop_event = threading.Event()
+        self.stop_reason = None
+        self.done = threading.Event()
+        self.partial_files = set()
+
+    def request_stop(self, reason):
+        self.stop_reason = reason
+        self.stop_event.set()
+
+    def check_stopped(self):
+        if self.stop_event.is_set():
+            raise load_yt_dlp().utils.DownloadCancelled(
+                f"Download {self.stop_reason}"
+            )
 
 
 class DownloadManager:
-    def __init__(self, page):
+    def __init__(
+        self,
+        page,
+        history=None,
+        info_cache=None,
+        archive=None,
+        journal=None,
+        file_index=None,
+    ):
         self.page = page
-        self.current_downloads = []
-        self.downloads_history = []
+        self.current_downloads = {}
+        # Stores are tested against None: an empty archive is falsy, as it
+        # has a length, but must not be swapped for the default one.
+        if history is None:
+            history = HistoryStore(os.path.join(default_data_path, "history.db"))
+        self.history = history
+        if info_cache is None:
+            info_cache = InfoCache(os.path.join(default_data_path, "cache", "info"))
+        self.info_cache = info_cache
+        if archive is None:
+            archive = DownloadArchive(os.path.join(default_data_path, "archive.txt"))
+        self.archive = archive
+        if journal is None:
+            journal = JobJournal(os.path.join(default_data_path, "queue.db"))
+        self.journal = journal
+        if file_index is None:
+            file_index = FileIndex(os.path.join(default_data_path, "written.db"))
+        self.file_index = file_index
+        self._content_index = None
+        # Output directories indexed by _scan_output() this session.
+        self._scanned = set()
         self.options = YtdlpOptions()
+        self.shaper = BandwidthShaper(self.current_rate_limit)
+        self.metrics = MetricsRegistry()
+        self.event_log = None
+        self._metrics_server = None
+
+        # Scheduler state, all guarded by self._cond.
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._playlists = {}
+        self._workers = []
+        self._running = 0
+        self._running_per_host = defaultdict(int)
+        # host -> monotonic time until which it is left alone after a 429
+        self._host_cooldown = {}
+        self._wake_at = None
+        # job id -> bytes its running download is expected to write
+        self._reserved_space = {}
+        self._format_selectors = {}
+        self._processing = 0
+        self._probe_executor = None
+        self._postprocess_executor = None
+        self._finish_executor = None
+        self._ydl_pool = YoutubeDLPool(load_yt_dlp)
+        # Only starts processes once a job runs with execution_mode "process".
+        self._worker_pool = WorkerPool()
+        self._register_metrics()
+
+    def _register_metrics(self):
+        metrics = self.metrics
+        self._jobs_total = metrics.counter(
+            "ytdlpg_jobs_total", "Finished jobs by final status."
+        )
+        self._errors_total = metrics.counter(
+            "ytdlpg_errors_total", "Failed jobs by error class."
+        )
+        self._retries_total = metrics.counter(
+            "ytdlpg_retries_total", "Retried download attempts by error class."
+        )
+        self._bytes_total = metrics.counter(
+            "ytdlpg_bytes_total", "Bytes downloaded by host."
+        )
+        self._stage_seconds = {
+            stage: metrics.histogram(f"ytdlpg_{stage}_seconds", help)
+            for stage, help in (
+                ("queue_wait", "Time from queueing to a worker picking the job up."),
+                ("extract", "Time spent on extraction in the download stage."),
+                ("download", "Time spent transferring media."),
+                ("postprocess", "Time spent in post-processors."),
+            )
+        }
+        metrics.gauge(
+            "ytdlpg_jobs_running",
+            "Jobs holding a download slot.",
+            lambda: self._running,
+        )
+        metrics.gauge(
+            "ytdlpg_jobs_processing",
+            "Jobs in the post-processing pool.",
+            lambda: self._processing,
+        )
+        metrics.gauge(
+            "ytdlpg_jobs_queued", "Jobs waiting for a slot.", self.queued_count
+        )
+        metrics.gauge(
+            "ytdlpg_throughput_bytes", "Measured bytes per second.", self.throughput
+        )
+        metrics.counter(
+            "ytdlpg_ydl_created_total",
+            "YoutubeDL instances built.",
+            lambda: self._ydl_pool.created,
+        )
+        metrics.counter(
+            "ytdlpg_ydl_reused_total",
+            "Jobs and probes served by a pooled YoutubeDL.",
+            lambda: self._ydl_pool.reused,
+        )
+        metrics.counter(
+            "ytdlpg_workers_started_total",
+            "Download worker processes started.",
+            lambda: self._worker_pool.started,
+        )
+        metrics.counter(
+            "ytdlpg_workers_killed_total",
+            "Download worker processes killed after a crash or stall.",
+            lambda: self._worker_pool.killed,
+        )
+
+    def configure_telemetry(self):
+        """Start or stop the metrics endpoint and event log to match options."""
+        port = self.options.metrics_port
+        server = self._metrics_server
+        if server is not None and server.port != port:
+            server.close()
+            self._metrics_server = None
+        if port and self._metrics_server is None:
+            self._metrics_server = MetricsServer(self.metrics, port)
+
+        path = self.options.event_log
+        log = self.event_log
+        if log is not None and log.path != path:
+            self.event_log = None
+            log.close()
+        if path and self.event_log is None:
+            self.event_log = EventLog(path)
+
+    def _event(self, event, job, **fields):
+        log = self.event_log
+        if log is not None:
+            log.write(event, id=job.info["id"], url=job.info["url"], **fields)
+
+    def _record_metrics(self, job):
+        # Called once per job, from whichever path finished it.
+        metrics = job.metrics
+        status = job.info["status"]
+        self._jobs_total.inc(status=status)
+        if metrics.started_at is not None:
+            self._stage_seconds["queue_wait"].observe(metrics.queue_wait)
+        for stage, value in (
+            ("extract", metrics.extract_time),
+            ("download", metrics.download_time),
+            ("postprocess", metrics.postprocess_time),
+        ):
+            if value:
+                self._stage_seconds[stage].observe(value)
+        if metrics.bytes:
+            self._bytes_total.inc(metrics.bytes, host=job.host)
+        if status == "error":
+            self._errors_total.inc(error_class=metrics.error_class or "unknown")
+
+        job.info["metrics"] = metrics.to_dict()
+        self._event("finished", job, status=status, **job.info["metrics"])
+
+    def stage_means(self):
+        return {
+            stage: histogram.mean() for stage, histogram in self._stage_seconds.items()
+        }
+
+    def preload(self):
+        threading.Thread(target=load_yt_dlp, daemon=True).start()
+
+    def _probe_pool(self):
+        if self._probe_executor is None:
+            self._probe_executor = ThreadPoolExecutor(
+                max_workers=max(1, self.options.max_probes),
+                thread_name_prefix="ytdlpg-probe",
+            )
+        return self._probe_executor
+
+    def _postprocess_pool(self):
+        # ffmpeg work is CPU bound, so it gets processes instead of the
+        # download threads; a transcode no longer holds a network slot.
+        if self._postprocess_executor is None:
+            self._postprocess_executor = ProcessPoolExecutor(
+                max_workers=self.options.postprocess_workers or os.cpu_count(),
+                mp_context=process_context(),
+            )
+        return self._postprocess_executor
+
+    def _finish_pool(self):
+        # Post-processed jobs are finished here: the process pool runs its
+        # done callbacks on the thread that feeds and collects its work, so
+        # moving a large file to a slow disk there would stall the pool.
+        if self._finish_executor is None:
+            self._finish_executor = ThreadPoolExecutor(
+                max_workers=self.options.postprocess_workers or os.cpu_count(),
+                thread_name_prefix="ytdlpg-finish",
+            )
+        return self._finish_executor
+
+    def probe(self, url, options=None):
+        """Extract `url` in the background with `options` (the current ones
+        by default, as they are when called); returns a Future."""
+        return self._probe_pool().submit(self._probe, url, options or self.options)
+
+    def download(
+        self,
+        url,
+        on_progress,
+        on_complete,
+        on_error,
+        priority=0,
+        on_queued=None,
+        format=None,
+        info=None,
+        rate_limit=0,
+    ):
+        options = self.options
+        download_info = self._new_info(url, priority)
+        if self._is_archived(url):
+            # Already fetched before: never reaches the queue.
+            download_info["status"] = "skipped"
+            download_info["progress"] = 100
+            download_info["end_time"] = datetime.now()
+            self.history.add(download_info)
+            return download_info
+
+        if options.playlist and info is None:
+            return self._download_playlist(
+                download_info,
+                on_progress,
+                on_complete,
+                on_error,
+                on_queued,
+                format,
+                options,
+            )
+
+        job = DownloadJob(download_info, priority, on_progress, on_complete, on_error)
+        job.options = options
+        job.format = format
+        job.rate_limit = rate_limit
+        if rate_limit:
+            download_info["rate_limit"] = rate_limit
+
+        # Let the caller register the job before a worker can pick it up.
+        if on_queued:
+            on_queued(download_info)
+
+        self._start_probe(job, info)
+        self._enqueue(job)
+        return download_info
+
+    def download_many(
+        self,
+        urls,
+        on_progress,
+        on_complete,
+        on_error,
+        priority=0,
+        on_queued=None,
+    ):
+        """Queue a batch of URLs at once. URLs that are already queued are
+        left out; the rest are journaled in one transaction and handed to
+        the scheduler under a single lock. Returns the new download infos,
+        including the ones skipped by the archive."""
+        with self._cond:
+            active = {
+                cache_key(info["url"]) for info in self.current_downloads.values()
+            }
+
+        options = self.options
+        added = []
+        jobs = []
+        for url in urls:
+            key = cache_key(url)
+            if key in active:
+                continue
+            active.add(key)
+
+            download_info = self._new_info(url, priority)
+            added.append(download_info)
+            if self._is_archived(url):
+                download_info["status"] = "skipped"
+                download_info["progress"] = 100
+                download_info["end_time"] = datetime.now()
+                self.history.add(download_info)
+                continue
 
-    def download(self, url, on_progress, on_complete, on_error):
-        download_info = {
+            if options.playlist:
+                self._download_playlist(
+                    download_info,
+                    on_progress,
+                    on_complete,
+                    on_error,
+                    on_queued,
+                    None,
+                    options,
+                )
+                continue
+
+            job = DownloadJob(
+                download_info, priority, on_progress, on_complete, on_error
+            )
+            job.options = options
+            if on_queued:
+                on_queued(download_info)
+            self._start_probe(job)
+            jobs.append(job)
+
+        self._enqueue_many(jobs)
+        return added
+
+    def restore(self, on_progress, on_complete, on_error, on_queued=None):
+        """Queue again the jobs a previous run left unfinished, paused ones
+        still paused. Partial files are picked up where they stopped."""
+        restored = []
+        for entry in self.journal.unfinished():
+            url = entry["url"]
+            if self._is_archived(url):
+                # Finished, but the run ended before the journal caught up.
+                self.journal.remove(entry["id"])
+                continue
+
+            download_info = self._new_info(url, entry["priority"])
+            download_info["title"] = entry["title"] or download_info["title"]
+            download_info["path"] = entry["path"] or download_info["path"]
+            download_info["restored"] = True
+            # The settings it was queued with, not the ones of this run.
+            options = self.options
+            if entry["options"] is not None:
+                options = YtdlpOptions.from_dict(entry["options"])
+            if entry["playlist"]:
+                self.journal.remove(entry["id"])
+                restored.append(
+                    self._download_playlist(
+                        download_info,
+                        on_progress,
+                        on_complete,
+                        on_error,
+                        on_queued,
+                        entry["format"],
+                        options,
+                    )
+                )
+                continue
+
+            job = DownloadJob(
+                download_info, entry["priority"], on_progress, on_complete, on_error
+            )
+            job.journal_id = entry["id"]
+            job.options = options
+            job.format = entry["format"]
+            job.rate_limit = entry["rate_limit"]
+            job.partial_files.update(entry["partial_files"])
+            if job.rate_limit:
+                download_info["rate_limit"] = job.rate_limit
+            if entry["status"] == "paused":
+                job.paused = True
+                download_info["status"] = "paused"
+
+            if on_queued:
+                on_queued(download_info)
+            self._start_probe(job)
+            self._enqueue(job)
+            restored.append(download_info)
+        return restored
+
+    def _is_archived(self, url):
+        options = self.options
+        if not options.use_archive and not options.dedupe_files:
+            return False
+        entry_id = archive_id_from_url(url)
+        if entry_id is None:
+            cached = self.info_cache.peek(url, options.playlist)
+            entry_id = archive_id_from_info(cached) if cached else None
+        return self._have(entry_id, options)
+
+    def _have(self, entry_id, options):
+        # Downloaded before according to the archive or, with dedupe_files,
+        # a file for it is already in the output directory.
+        if entry_id is None:
+            return False
+        if options.use_archive and entry_id in self.archive:
+            return True
+        if options.dedupe_files:
+            self._scan_output(options.output_path)
+            media_id = entry_id.split(" ", 1)[1]
+            return (
+                self.content_index().find_media(media_id, options.output_path)
+                is not None
+            )
+        return False
+
+    def content_index(self):
+        if self._content_index is None:
+            self._content_index = ContentIndex(
+                os.path.join(default_data_path, "files.db")
+            )
+        return self._content_index
+
+    def _scan_output(self, directory):
+        # Index what is already in an output directory, once per session,
+        # in the background; until it is done only duplicates by content
+        # are found, after the download.
+        with self._cond:
+            if directory in self._scanned:
+                return
+            self._scanned.add(directory)
+        threading.Thread(
+            target=self.content_index().scan,
+            args=(directory,),
+            name="ytdlpg-scan",
+            daemon=True,
+        ).start()
+
+    def _record_download(self, job, info):
+        download_info = job.info
+        entry_id = archive_id_from_info(info)
+        if job.options.use_archive:
+            self.archive.add(entry_id)
+
+        paths = [
+            requested["filepath"]
+            for requested in info.get("requested_downloads") or [info]
+            if requested.get("filepath")
+        ]
+        if paths:
+            # Templates may put the file in a subdirectory; open that one.
+            download_info["path"] = os.path.dirname(paths[0])
+            if entry_id:
+                self.file_index.add(
+                    entry_id, job.options.output_path, _variant(job), paths
+                )
+
+        if not job.options.dedupe_files:
+            return
+        for requested in info.get("requested_downloads") or [info]:
+            path = requested.get("filepath")
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                duplicate = self.content_index().find_duplicate(path, info.get("id"))
+            except OSError:
+                continue
+            if duplicate:
+                download_info["duplicate_of"] = duplicate
+
+    def _new_info(self, url, priority):
+        return {
+            "id": next(self._ids),
             "url": url,
             "start_time": datetime.now(),
-            "status": "downloading",
+            "status": "queued",
             "progress": 0,
-            "title": "Fetching...",
+            "title": self.info_cache.peek_title(url) or "Queued...",
             "path": self.options.output_path,
+            "priority": priority,
         }
-        self.current_downloads.append(download_info)
+
+    def _start_probe(self, job, info=None):
+        # Probing runs ahead on its own pool; the download stage waits for it.
+        # The job's options are fixed here, so the probe extracts it the way
+        # it will be downloaded whatever changes while probes are queued.
+        if job.options is None:
+            job.options = self.options
+        if info is not None:
+            # Already probed (e.g. by the format picker or playlist expansion).
+            job.probe = Future()
+            job.probe.set_result(info)
+        else:
+            job.probe = self.probe(job.info["url"], job.options)
+            job.probe.add_done_callback(lambda future: self._on_probed(job, future))
+
+    def _enqueue(self, job):
+        if job.options is None:
+            job.options = self.options
+        self._event("queued", job, priority=job.priority)
+        self._journal(job)
+        with self._cond:
+            self.current_downloads[job.info["id"]] = job.info
+            self._jobs[job.info["id"]] = job
+            self._push(job)
+            self._ensure_workers()
+            self._cond.notify_all()
+
+    def _enqueue_many(self, jobs):
+        if not jobs:
+            return
+        for job in jobs:
+            if job.options is None:
+                job.options = self.options
+            self._event("queued", job, priority=job.priority)
+        ids = self.journal.save_many(
+            [
+                (
+                    job.journal_id,
+                    job.info,
+                    job.format,
+                    job.rate_limit,
+                    job.partial_files,
+                    job.options,
+                )
+                for job in jobs
+            ]
+        )
+        with self._cond:
+            for job, journal_id in zip(jobs, ids):
+                job.journal_id = journal_id
+                self.current_downloads[job.info["id"]] = job.info
+                self._jobs[job.info["id"]] = job
+                self._push(job)
+            self._ensure_workers()
+            self._cond.notify_all()
+
+    def _download_playlist(
+        self,
+        download_info,
+        on_progress,
+        on_complete,
+        on_error,
+        on_queued,
+        format,
+        options=None,
+    ):
+        download_info["title"] = "Expanding playlist..."
+        download_info["playlist"] = True
+        playlist = PlaylistJob(download_info, on_progress, on_complete, on_error)
+        playlist.options = options or self.options
+        # Until its entries are queued, a restart has to expand it again.
+        playlist.journal_id = self.journal.save(
+            None, download_info, format, options=playlist.options
+        )
+        with self._cond:
+            self.current_downloads[download_info["id"]] = download_info
+            self._playlists[download_info["id"]] = playlist
+
+        if on_queued:
+            on_queued(download_info)
+
+        self._probe_pool().submit(self._expand_playlist, playlist, on_queued, format)
+        return download_info
+
+    def _expand_playlist(self, playlist, on_queued, format):
+        download_info = playlist.info
+        url = download_info["url"]
+        try:
+            # Flat extraction lists the entries without resolving each one.
+            opts = {"quiet": True, "no_warnings": True, "extract_flat": "in_playlist"}
+            with load_yt_dlp().YoutubeDL(opts) as ydl:
+                info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        except Exception as e:
+            playlist.expanding = False
+            self._finish_playlist(playlist, error=str(e))
+            return
+
+        if playlist.cancelled:
+            playlist.expanding = False
+            self._finish_playlist(playlist)
+            return
+
+        if info.get("_type") != "playlist":
+            # Not a playlist after all: run the same row as a normal job.
+            with self._cond:
+                self._playlists.pop(download_info["id"], None)
+            self.journal.remove(playlist.journal_id)
+            download_info.pop("playlist", None)
+            download_info["title"] = info.get("title", download_info["title"])
+            # Extracted with playlists on, so cached as such.
+            self.info_cache.put(url, info, playlist=True)
+
+            job = DownloadJob(
+                download_info,
+                download_info["priority"],
+                playlist.on_progress,
+                playlist.on_complete,
+                playlist.on_error,
+            )
+            job.format = format
+            job.options = playlist.options
+            self._start_probe(job, info)
+            self._enqueue(job)
+            return
+
+        entries = [entry for entry in info.get("entries") or [] if entry]
+        playlist.playlist_id = f"{info.get('extractor_key')}:{info.get('id')}"
+        already_done = self.history.playlist_entries(playlist.playlist_id)
+
+        children = []
+        with playlist.lock:
+            playlist.total = len(entries)
+            for entry in entries:
+                entry_id = str(entry.get("id") or entry_url(entry))
+                archived = (
+                    entry.get("ie_key")
+                    and entry.get("id")
+                    and self._have(
+                        archive_id(entry["ie_key"], entry["id"]), playlist.options
+                    )
+                )
+                if entry_id in already_done or archived:
+                    playlist.done += 1
+                else:
+                    children.append((entry, entry_id))
+            playlist.update_progress()
+
+        download_info["title"] = info.get("title") or url
+        download_info["status"] = "downloading"
+        playlist.on_progress(download_info)
+
+        on_progress, on_complete, on_error = self._child_callbacks(playlist)
+        for entry, entry_id in children:
+            if playlist.cancelled:
+                break
+
+            child_info = self._new_info(entry_url(entry), download_info["priority"])
+            child_info["title"] = entry.get("title") or child_info["title"]
+            child_info["parent_id"] = download_info["id"]
+            child_info["entry_id"] = entry_id
+
+            job = DownloadJob(
+                child_info, child_info["priority"], on_progress, on_complete, on_error
+            )
+            job.format = format
+            job.options = playlist.options
+            job.parent = playlist
+            with playlist.lock:
+                playlist.pending.add(child_info["id"])
+
+            if on_queued:
+                on_queued(child_info)
+            self._start_probe(job)
+            self._enqueue(job)
+
+        # The entries are journaled on their own now.
+        self.journal.remove(playlist.journal_id)
+        with playlist.lock:
+            playlist.expanding = False
+            finished = not playlist.pending
+        if finished:
+            self._finish_playlist(playlist)
+
+    def _child_callbacks(self, playlist):
+        def on_progress(child_info):
+            with playlist.lock:
+                playlist.child_progress[child_info["id"]] = child_info["progress"]
+                playlist.update_progress()
+            playlist.on_progress(child_info)
+            playlist.on_progress(playlist.info)
+
+        def on_complete(child_info):
+            self.history.mark_playlist_entry(
+                playlist.playlist_id, child_info["entry_id"]
+            )
+            playlist.on_complete(child_info)
+            self._child_done(playlist, child_info)
+
+        def on_error(child_info, error_message):
+            playlist.on_error(child_info, error_message)
+            self._child_done(playlist, child_info)
+
+        return on_progress, on_complete, on_error
+
+    def _child_done(self, playlist, child_info):
+        with playlist.lock:
+            playlist.pending.discard(child_info["id"])
+            playlist.child_progress.pop(child_info["id"], None)
+            # Entries found already downloaded count as done, as they do
+            # when the playlist is expanded; one cancelled on its own is
+            # missing from the result, so it counts as failed.
+            if child_info["status"] in ("completed", "skipped"):
+                playlist.done += 1
+            elif child_info["status"] == "error" or not playlist.cancelled:
+                playlist.failed += 1
+            playlist.update_progress()
+            finished = not playlist.pending and not playlist.expanding
+
+        if finished:
+            self._finish_playlist(playlist)
+        else:
+            playlist.on_progress(playlist.info)
+
+    def _finish_playlist(self, playlist, error=None):
+        download_info = playlist.info
+        with self._cond:
+            if self._playlists.pop(download_info["id"], None) is None:
+                return
+            self.current_downloads.pop(download_info["id"], None)
+        self.journal.remove(playlist.journal_id)
+
+        if error is None and playlist.failed:
+            error = f"{playlist.failed} of {playlist.total} items failed"
+
+        download_info["end_time"] = datetime.now()
+        if playlist.cancelled:
+            download_info["status"] = "cancelled"
+        elif error:
+            download_info["status"] = "error"
+            download_info["error"] = error
+        else:
+            download_info["status"] = "completed"
+            download_info["progress"] = 100
+        self.history.add(download_info)
+
+        # Cancellation is reported by whoever called cancel().
+        if download_info["status"] == "completed":
+            playlist.on_complete(download_info)
+        elif download_info["status"] == "error":
+            playlist.on_error(download_info, error)
+
+    def pause(self, download_id, timeout=None):
+        with self._cond:
+            job = self._jobs.get(download_id)
+            if job is None:
+                return False
+
+            download_info = job.info
+            if download_info["status"] == "queued":
+                job.paused = True
+                download_info["status"] = "paused"
+                self._journal(job)
+                job.on_progress(download_info)
+                return True
+
+            # Once post-processing has started there is no partial file to
+            # keep, so only active transfers can be paused.
+            if download_info["status"] != "downloading":
+                return False
+            job.request_stop("paused")
+
+        # The worker keeps the .part file and re-queues the job as paused.
+        return job.done.wait(timeout) and download_info["status"] == "paused"
+
+    def resume(self, download_id):
+        with self._cond:
+            job = self._jobs.get(download_id)
+            if job is None or not job.paused:
+                return False
+            download_info = job.info
+            job.paused = False
+            download_info["status"] = "queued"
+            self._cond.notify_all()
+        self._event("resumed", job)
+        self._journal(job)
+        job.on_progress(download_info)
+        return True
+
+    def cancel(self, download_id, timeout=None):
+        with self._cond:
+            playlist = self._playlists.get(download_id)
+        if playlist is not None:
+            return self._cancel_playlist(playlist, timeout)
+
+        with self._cond:
+            job = self._jobs.get(download_id)
+            if job is None:
+                return False
+
+            job.request_stop("cancelled")
+            if job.info["status"] in ("queued", "paused"):
+                job.removed = True
+                del self._jobs[download_id]
+                self._finish_cancelled(job)
+                job.done.set()
+                stopped = True
+            else:
+                stopped = False
+            postprocess = job.postprocess
+
+        if postprocess is not None:
+            # Only post-processing that has not started yet can be dropped;
+            # a running ffmpeg is left to finish.
+            postprocess.cancel()
+
+        if stopped:
+            # A paused job may have left partial files behind.
+            self._cleanup_partial_files(job)
+            if job.parent:
+                self._child_done(job.parent, job.info)
+            return True
+
+        # The worker notices the flag in its next yt-dlp hook call and aborts.
+        return job.done.wait(timeout)
+
+    def _cancel_playlist(self, playlist, timeout=None):
+        playlist.cancelled = True
+        with playlist.lock:
+            child_ids = list(playlist.pending)
+        for child_id in child_ids:
+            self.cancel(child_id, timeout)
+
+        with playlist.lock:
+            finished = not playlist.pending and not playlist.expanding
+        if finished:
+            self._finish_playlist(playlist)
+        return True
+
+    def set_priority(self, download_id, priority):
+        with self._cond:
+            job = self._jobs.get(download_id)
+            if job is None or job.info["status"] not in ("queued", "paused"):
+                return False
+            # The old heap entry is skipped lazily once the job is re-pushed.
+            job.priority = priority
+            job.info["priority"] = priority
+            self._push(job)
+            self._cond.notify_all()
+        self._journal(job)
+        return True
+
+    def set_rate_limit(self, download_id, rate_limit):
+        with self._cond:
+            job = self._jobs.get(download_id)
+            if job is None:
+                return False
+            job.rate_limit = rate_limit or 0
+            if rate_limit:
+                job.info["rate_limit"] = rate_limit
+            else:
+                job.info.pop("rate_limit", None)
+        self.shaper.set_job_limit(download_id, rate_limit)
+        if job.journal_id is not None:
+            self._journal(job)
+        return True
+
+    def current_rate_limit(self):
+        try:
+            schedule = parse_schedule(self.options.rate_schedule)
+        except ValueError:
+            schedule = []
+        return scheduled_rate(schedule, self.options.rate_limit)
+
+    def throughput(self):
+        return self.shaper.total_rate()
+
+    def get(self, download_id):
+        return self.current_downloads.get(download_id)
+
+    def queued_count(self):
+        with self._cond:
+            return (
+                len(self.current_downloads)
+                - self._running
+                - self._processing
+                - len(self._playlists)
+            )
+
+    def _push(self, job):
+        job.seq = next(self._seq)
+        heapq.heappush(self._queue, (-job.priority, job.seq, job))
+
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < max(1, self.options.max_concurrent):
+            worker = threading.Thread(target=self._worker, daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_job(self):
+        self._wake_at = None
+        if self._running >= max(1, self.options.max_concurrent):
+            return None
+
+        now = time.monotonic()
+        skipped = []
+        job = None
+        while self._queue:
+            neg_priority, seq, candidate = heapq.heappop(self._queue)
+            if candidate.removed or seq != candidate.seq:
+                continue
+            if candidate.info["status"] != "queued":
+                # Paused jobs keep their place in line.
+                skipped.append((neg_priority, seq, candidate))
+                continue
+            # Jobs waiting out a retry delay or a rate-limited host.
+            ready_at = max(
+                candidate.not_before, self._host_cooldown.get(candidate.host, 0)
+            )
+            if ready_at > now:
+                skipped.append((neg_priority, seq, candidate))
+                if self._wake_at is None or ready_at < self._wake_at:
+                    self._wake_at = ready_at
+                continue
+            limit = self.options.per_host_limit
+            if limit and self._running_per_host[candidate.host] >= limit:
+                skipped.append((neg_priority, seq, candidate))
+                continue
+            job = candidate
+            break
+
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        return job
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    timeout = None
+                    if self._wake_at is not None:
+                        timeout = max(0, self._wake_at - time.monotonic())
+                    self._cond.wait(timeout)
+                    job = self._next_job()
+                self._running += 1
+                self._running_per_host[job.host] += 1
+                job.done.clear()
+                if job.metrics.started_at is None:
+                    job.metrics.started_at = time.monotonic()
+                    job.metrics.queue_wait = (
+                        job.metrics.started_at - job.metrics.queued_at
+                    )
+                job.info["status"] = "downloading"
+                if not job.partial_files:
+                    job.info["title"] = "Fetching..."
+
+            self._event("started", job, host=job.host)
+            self._journal(job)
+            self.shaper.register(job.info["id"], job.rate_limit)
+            try:
+                self._run(job)
+            finally:
+                self.shaper.unregister(job.info["id"])
+                with self._cond:
+                    self._reserved_space.pop(job.info["id"], None)
+                    self._running -= 1
+                    self._running_per_host[job.host] -= 1
+                    status = job.info["status"]
+                    if status not in ("queued", "paused", "processing"):
+                        self._jobs.pop(job.info["id"], None)
+                    self._cond.notify_all()
+                # Jobs handed to the post-processing pool finish from there.
+                if status != "processing":
+                    job.done.set()
+
+    def _finish_cancelled(self, job):
+        download_info = job.info
+        download_info["status"] = "cancelled"
+        download_info["end_time"] = datetime.now()
+        self.current_downloads.pop(download_info["id"], None)
+        self._unjournal(job)
+        self._record_metrics(job)
+        self.history.add(download_info)
+
+    def _requeue_paused(self, job):
+        self._event("paused", job)
+        job.stop_event.clear()
+        job.stop_reason = None
+        job.paused = True
+        job.info["status"] = "paused"
+        job.info.pop("speed", None)
+        job.info.pop("throughput", None)
+        self._push(job)
+        self._journal(job)
+
+    def _journal(self, job):
+        # Write-through of the job's current state, see JobJournal.
+        job.journal_id = self.journal.save(
+            job.journal_id,
+            job.info,
+            job.format,
+            job.rate_limit,
+            job.partial_files,
+            job.options,
+        )
+
+    def _unjournal(self, job):
+        if job.journal_id is not None:
+            self.journal.remove(job.journal_id)
+            job.journal_id = None
+
+    def _cleanup_partial_files(self, job):
+        for filename in job.partial_files:
+            candidates = [filename + ".part", filename + ".ytdl"]
+            candidates += glob.glob(glob.escape(filename) + ".part-Frag*")
+            for path in candidates:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if job.options.staging_path:
+                _remove_empty_dirs(
+                    os.path.dirname(filename), job.options.staging_path
+                )
+
+    def _extract(self, ydl, url):
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        self.info_cache.put(url, info, playlist=not ydl.params.get("noplaylist"))
+        return info
+
+    def _probe(self, url, options):
+        info = self.info_cache.get(url, options.playlist)
+        if info is None:
+            noplaylist = not options.playlist
+            pooled = self._ydl_pool.acquire(
+                ("probe", noplaylist),
+                lambda: {"quiet": True, "no_warnings": True, "noplaylist": noplaylist},
+            )
+            reusable = False
+            try:
+                info = self._extract(pooled.ydl, url)
+                reusable = True
+            finally:
+                self._ydl_pool.release(pooled, reusable)
+        return info
+
+    def _on_probed(self, job, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        info = future.result()
+        if job.info["status"] in ("queued", "paused"):
+            job.info["title"] = info.get("title", job.info["title"])
+            job.on_progress(job.info)
+
+    def _wait_for_probe(self, job):
+        while True:
+            job.check_stopped()
+            try:
+                return job.probe.result(timeout=0.5)
+            except TimeoutError:
+                continue
+            except Exception:
+                # Extract again in the download stage so the error is reported
+                # with the job's own options.
+                return None
+
+    def _extract_and_download(self, ydl, job):
+        yt_dlp = load_yt_dlp()
+        url = job.info["url"]
+        started = time.monotonic()
+
+        def download(info):
+            # Everything up to here counts as extraction, the rest as transfer.
+            job.metrics.extract_time = time.monotonic() - started
+            return ydl.process_ie_result(add_template_fields(info), download=True)
+
+        info = self._wait_for_probe(job) if job.probe else None
+        if info is None:
+            info = self.info_cache.get(url, job.options.playlist)
+        if info is not None:
+            self._check_archive(job, info)
+            self._check_space(job, info)
+            try:
+                return download(info)
+            except yt_dlp.utils.DownloadCancelled:
+                raise
+            except yt_dlp.utils.DownloadError:
+                # Cached format URLs may have expired; extract again.
+                self.info_cache.invalidate(url, job.options.playlist)
+                job.check_stopped()
+
+        info = self._extract(ydl, url)
+        self._check_archive(job, info)
+        self._check_space(job, info)
+        job.info["title"] = info.get("title", job.info["title"])
+        job.on_progress(job.info)
+        job.check_stopped()
+        return download(info)
+
+    def _download_in_worker(self, job, key, ydl_opts, progress_hook):
+        yt_dlp = load_yt_dlp()
+        url = job.info["url"]
+        started = time.monotonic()
+
+        # Extraction stays here, so titles and archive checks work as in
+        # thread mode; the worker only re-extracts if the formats expired.
+        info = self._wait_for_probe(job) if job.probe else None
+        if info is None:
+            info = self.info_cache.get(url, job.options.playlist)
+        if info is None:
+            info = self._probe(url, job.options)
+            job.info["title"] = info.get("title", job.info["title"])
+            job.on_progress(job.info)
+        self._check_archive(job, info)
+        self._check_space(job, info)
+        add_template_fields(info)
+        job.check_stopped()
+
+        def on_progress(d):
+            if not job.metrics.extract_time:
+                job.metrics.extract_time = time.monotonic() - started
+            progress_hook(d)
+
+        worker = self._worker_pool.acquire()
+        healthy = False
+        try:
+            result = run_in_worker(
+                worker,
+                job,
+                key,
+                ydl_opts,
+                info,
+                lambda: self.shaper.job_limit(job.info["id"]),
+                on_progress,
+                job.options.worker_stall_timeout,
+            )
+            healthy = True
+            return result
+        except yt_dlp.utils.DownloadCancelled:
+            healthy = True
+            raise
+        except WorkerError as e:
+            healthy = e.healthy
+            if not healthy:
+                self._event("worker_restarted", job, error=str(e))
+            raise
+        finally:
+            self._worker_pool.release(worker, healthy)
+
+    def _check_archive(self, job, info):
+        entry_id = archive_id_from_info(info)
+        if job.options.use_archive and entry_id in self.archive:
+            raise AlreadyDownloaded(info.get("title"))
+        # yt-dlp skips files it finds on disk; it would look in the staging
+        # directory, and in a huge output directory looking is slow.
+        if entry_id and self.file_index.find(
+            entry_id, job.options.output_path, _variant(job)
+        ):
+            raise AlreadyDownloaded(info.get("title"))
+
+    def _check_space(self, job, info):
+        # Admit the download only if it fits next to the ones already
+        # running, on the disk it is written to and the one it ends up on.
+        options = job.options
+        needed = expected_size(info, self._format_selector(job))
+        paths = {options.staging_path or options.output_path, options.output_path}
+        free = {path: free_space(path) for path in paths}
+        with self._cond:
+            others = sum(
+                size
+                for job_id, size in self._reserved_space.items()
+                if job_id != job.info["id"]
+            )
+            for path, available in free.items():
+                if available - others - needed < options.min_free_space:
+                    raise NotEnoughSpace(path, needed, available - others)
+            self._reserved_space[job.info["id"]] = needed
+        job.info.pop("waiting_for_space", None)
+
+    def _format_selector(self, job):
+        # What the job will download: its picked format, or what its
+        # options ask for (the best audio when extracting audio).
+        spec = job.format or job.options.to_ydl_opts()["format"]
+        with self._cond:
+            selector = self._format_selectors.get(spec)
+        if selector is None:
+            noplaylist = not job.options.playlist
+            pooled = self._ydl_pool.acquire(
+                ("probe", noplaylist),
+                lambda: {"quiet": True, "no_warnings": True, "noplaylist": noplaylist},
+            )
+            try:
+                selector = pooled.ydl.build_format_selector(spec)
+            finally:
+                self._ydl_pool.release(pooled)
+            with self._cond:
+                self._format_selectors[spec] = selector
+        return selector
+
+    def _hold_for_space(self, job, error):
+        download_info = job.info
+        with self._cond:
+            job.not_before = time.monotonic() + SPACE_RECHECK_INTERVAL
+            download_info["status"] = "queued"
+            download_info["waiting_for_space"] = error.needed
+            download_info.pop("retry_at", None)
+            download_info.pop("speed", None)
+            download_info.pop("throughput", None)
+            self._push(job)
+            self._cond.notify_all()
+
+        self._journal(job)
+        self._event(
+            "held", job, path=error.path, needed=error.needed, free=error.free
+        )
+        job.on_progress(download_info)
+
+    def _move_staged_files(self, job, info):
+        # Files were written under staging_path; give them the same place
+        # under output_path and point the info at the moved files.
+        staging = os.path.abspath(job.options.staging_path)
+        output = os.path.abspath(job.options.output_path)
+        entries = list(info.get("requested_downloads") or [info])
+        entries += (info.get("requested_subtitles") or {}).values()
+        entries += info.get("thumbnails") or []
+        for entry in entries:
+            path = entry.get("filepath")
+            if not path or not os.path.exists(path):
+                continue
+            path = os.path.abspath(path)
+            if os.path.commonpath([path, staging]) != staging:
+                continue
+            destination = os.path.join(output, os.path.relpath(path, staging))
+            move_into_place(path, destination)
+            entry["filepath"] = destination
+            _remove_empty_dirs(os.path.dirname(path), staging)
+
+    def _run(self, job):
+        download_info = job.info
+        on_progress = job.on_progress
+        on_complete = job.on_complete
+
+        on_progress(download_info)
+        received = {"bytes": None}
+        received_lock = threading.Lock()
+        # A worker process applies the job's bandwidth share itself.
+        in_worker = job.options.execution_mode == "process"
 
         def progress_hook(d):
+            job.check_stopped()
+
+            filename = d.get("tmpfilename") or d.get("filename")
+            if filename:
+                filename = filename.removesuffix(".part")
+                if filename not in job.partial_files:
+                    job.partial_files.add(filename)
+                    # Lets a restored job clean up after itself if cancelled.
+                    self._journal(job)
+
             if d["status"] == "downloading":
                 if "total_bytes" in d and d["total_bytes"] > 0:
                     download_info["progress"] = (
@@ -37,40 +1366,264 @@ class DownloadManager:
 
                 download_info["title"] = d.get("info_dict", {}).get("title", "Unknown")
                 download_info["speed"] = d.get("speed", 0)
+                job.metrics.peak_speed = max(
+                    job.metrics.peak_speed, d.get("speed") or 0
+                )
+
+                # The counter restarts for every format of a merged download
+                # and starts at the resume offset for partial files.
+                # Fragment threads report concurrently.
+                downloaded = d.get("downloaded_bytes") or 0
+                with received_lock:
+                    last = received["bytes"]
+                    received["bytes"] = downloaded
+                if last is not None and downloaded > last:
+                    if in_worker:
+                        self.shaper.record(download_info["id"], downloaded - last)
+                    else:
+                        self.shaper.throttle(
+                            download_info["id"], downloaded - last, job.stop_event
+                        )
+                    job.check_stopped()
+                download_info["throughput"] = self.shaper.job_rate(download_info["id"])
+                download_info["bandwidth_limit"] = self.shaper.job_limit(
+                    download_info["id"]
+                )
 
                 on_progress(download_info)
 
             elif d["status"] == "finished":
+                job.metrics.bytes += (
+                    d.get("total_bytes") or d.get("downloaded_bytes") or 0
+                )
+                received["bytes"] = None
+                download_info.pop("throughput", None)
                 download_info["status"] = "processing"
                 download_info["title"] = d.get("info_dict", {}).get("title", "Unknown")
                 download_info["progress"] = 100
                 on_progress(download_info)
 
-        def download_thread():
-            try:
-                ydl_opts = self.options.to_ydl_opts()
-                ydl_opts["progress_hooks"] = [progress_hook]
+        def postprocessor_hook(d):
+            if job.stop_reason == "cancelled":
+                job.check_stopped()
 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=True)
-                    download_info["title"] = info.get("title", "Unknown")
-                    download_info["duration"] = info.get("duration", 0)
-                    download_info["status"] = "completed"
-                    download_info["end_time"] = datetime.now()
+        try:
+            job.check_stopped()
 
-                    self.current_downloads.remove(download_info)
-                    self.downloads_history.append(download_info)
+            ydl_opts = job.options.to_ydl_opts()
+            if job.format:
+                ydl_opts["format"] = job.format
+            ydl_opts, postprocess_opts = split_postprocessors(ydl_opts)
+            # Resumed jobs pick up from their .part files.
+            ydl_opts["continuedl"] = True
+            ratelimit = None
+            if ydl_opts.get("external_downloader"):
+                # External downloaders bypass the progress hook throttle, so
+                # hand them the job's current share as a fixed limit instead.
+                limit = self.shaper.job_limit(download_info["id"])
+                if limit:
+                    ratelimit = ydl_opts["ratelimit"] = int(limit)
 
-                    on_complete(download_info)
-            except Exception as e:
-                download_info["status"] = "error"
-                download_info["error"] = str(e)
+            # Everything the YoutubeDL is built from goes into the key.
+            key = (job.options, job.format, ratelimit)
+            started = time.monotonic()
+            if in_worker:
+                # The key only has to match between jobs in the same worker.
+                info = self._download_in_worker(
+                    job, hash(key), ydl_opts, progress_hook
+                )
+            else:
+                pooled = self._ydl_pool.acquire(key, lambda: ydl_opts)
+                pooled.progress_hook = progress_hook
+                pooled.postprocessor_hook = postprocessor_hook
+                reusable = False
+                try:
+                    ydl = pooled.ydl
+                    info = ydl.sanitize_info(self._extract_and_download(ydl, job))
+                    reusable = True
+                finally:
+                    self._ydl_pool.release(pooled, reusable)
+            download_info["title"] = info.get("title", "Unknown")
+            download_info["duration"] = info.get("duration", 0)
+            download_info["extractor"] = info.get("extractor_key")
+            job.metrics.download_time = (
+                time.monotonic() - started - job.metrics.extract_time
+            )
+            download_info["download_time"] = job.metrics.download_time
+
+            if postprocess_opts:
+                self._start_postprocessing(job, info, postprocess_opts)
+                return
+            self._finish_completed(job, info)
+        except Exception as e:
+            if job.stop_reason == "paused":
+                with self._cond:
+                    self._requeue_paused(job)
+                on_progress(download_info)
+                return
+
+            if job.stop_reason == "cancelled":
+                self._cleanup_partial_files(job)
+                with self._cond:
+                    self._finish_cancelled(job)
+                if job.parent:
+                    self._child_done(job.parent, download_info)
+                return
+
+            if isinstance(e, NotEnoughSpace):
+                self._hold_for_space(job, e)
+                return
+
+            if isinstance(e, AlreadyDownloaded):
+                download_info["status"] = "skipped"
+                download_info["title"] = str(e) or download_info["title"]
+                download_info["progress"] = 100
                 download_info["end_time"] = datetime.now()
+                with self._cond:
+                    self.current_downloads.pop(download_info["id"], None)
+                self._unjournal(job)
+                self._record_metrics(job)
+                self.history.add(download_info)
+                on_complete(download_info)
+                return
+
+            error_class = classify(e)
+            job.metrics.error_class = error_class
+            if self._schedule_retry(job, error_class, str(e)):
+                return
+            self._finish_error(job, str(e))
 
-                if download_info in self.current_downloads:
-                    self.current_downloads.remove(download_info)
-                self.downloads_history.append(download_info)
+    def _schedule_retry(self, job, error_class, error_message):
+        if (
+            error_class not in RETRYABLE
+            or job.metrics.retries >= job.options.max_retries
+        ):
+            return False
 
-                on_error(download_info, str(e))
+        download_info = job.info
+        now = time.monotonic()
+        delay = backoff_delay(job.metrics.retries, job.options.retry_delay)
+        job.metrics.retries += 1
+        self._retries_total.inc(error_class=error_class)
+
+        with self._cond:
+            if error_class == RATE_LIMITED:
+                # Back off from the whole site, not just this job.
+                delay = max(delay, job.options.host_cooldown)
+                self._host_cooldown[job.host] = max(
+                    self._host_cooldown.get(job.host, 0), now + delay
+                )
+            job.not_before = now + delay
+            download_info["status"] = "queued"
+            download_info["retry"] = job.metrics.retries
+            download_info["retry_at"] = datetime.now() + timedelta(seconds=delay)
+            download_info["last_error"] = error_message
+            download_info["error_class"] = error_class
+            download_info.pop("speed", None)
+            download_info.pop("throughput", None)
+            self._push(job)
+            self._cond.notify_all()
+
+        self._journal(job)
+        self._event(
+            "retry",
+            job,
+            attempt=job.metrics.retries,
+            delay=round(delay, 2),
+            error_class=error_class,
+            error=error_message,
+        )
+        job.on_progress(download_info)
+        return True
+
+    def failed_urls(self):
+        """URLs whose last download failed and that are not queued again."""
+        with self._cond:
+            active = {info["url"] for info in self.current_downloads.values()}
+        return [url for url in self.history.failed_urls() if url not in active]
+
+    def _finish_completed(self, job, info):
+        download_info = job.info
+        if job.options.staging_path:
+            try:
+                self._move_staged_files(job, info)
+            except OSError as e:
+                # The finished files stay in the staging directory.
+                job.metrics.error_class = classify(e)
+                self._finish_error(job, f"Could not move files into place: {e}")
+                return
+        download_info["status"] = "completed"
+        download_info["end_time"] = datetime.now()
+        self._record_download(job, info)
 
-        threading.Thread(target=download_thread, daemon=True).start()
+        with self._cond:
+            self.current_downloads.pop(download_info["id"], None)
+        self._unjournal(job)
+        self._record_metrics(job)
+        self.history.add(download_info)
+
+        job.on_complete(download_info)
+
+    def _finish_error(self, job, error_message):
+        download_info = job.info
+        download_info["status"] = "error"
+        download_info["error"] = error_message
+        download_info["end_time"] = datetime.now()
+
+        with self._cond:
+            self.current_downloads.pop(download_info["id"], None)
+        self._unjournal(job)
+        self._record_metrics(job)
+        self.history.add(download_info)
+
+        job.on_error(download_info, error_message)
+
+    def _start_postprocessing(self, job, info, postprocess_opts):
+        download_info = job.info
+        download_info["status"] = "processing"
+        download_info["progress"] = 100
+        download_info.pop("speed", None)
+        download_info.pop("throughput", None)
+
+        self._event("processing", job)
+        self._journal(job)
+        with self._cond:
+            self._processing += 1
+            job.postprocess = self._postprocess_pool().submit(
+                run_postprocessors, postprocess_opts, info
+            )
+        job.on_progress(download_info)
+        job.postprocess.add_done_callback(
+            lambda future: self._finish_pool().submit(
+                self._on_postprocessed, job, info, future
+            )
+        )
+
+    def _on_postprocessed(self, job, info, future):
+        download_info = job.info
+        with self._cond:
+            self._processing -= 1
+        try:
+            if future.cancelled() or job.stop_reason == "cancelled":
+                # The downloaded files are kept, as when a cancel lands
+                # between yt-dlp's own post-processors.
+                with self._cond:
+                    self._finish_cancelled(job)
+                if job.parent:
+                    self._child_done(job.parent, download_info)
+                return
+
+            try:
+                processed, elapsed = future.result()
+            except Exception as e:
+                job.metrics.error_class = classify(e)
+                self._finish_error(job, str(e))
+                return
+            job.metrics.postprocess_time = elapsed
+            download_info["processing_time"] = elapsed
+            info["requested_downloads"] = processed
+            self._finish_completed(job, info)
+        finally:
+            with self._cond:
+                self._jobs.pop(download_info["id"], None)
+            job.done.set()
@@ -0,0 +1,226 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; wide enough for both quick probes and hour-long transfers.
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A count that only goes up; kept here with `inc()`, or read at scrape
+    time from `read()` when something else already counts."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, read=None):
+        self.name = name
+        self.help = help
+        self.read = read
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        if self.read is not None:
+            return self.read()
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        if self.read is not None:
+            return [(self.name, (), self.read())]
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """A value read at scrape time from `read()`."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        return [(self.name, (), self.read())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def mean(self):
+        return self._sum / self._count if self._count else 0
+
+    def samples(self):
+        with self._lock:
+            samples = []
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self._counts):
+                cumulative += count
+                samples.append(
+                    (self.name + "_bucket", (("le", _number(bound)),), cumulative)
+                )
+            samples.append((self.name + "_sum", (), self._sum))
+            samples.append((self.name + "_count", (), self._count))
+            return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, read=None):
+        return self._register(Counter(name, help, read))
+
+    def gauge(self, name, help, read):
+        return self._register(Gauge(name, help, read))
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Serves a registry at http://127.0.0.1:<port>/metrics from a daemon
+    thread. Only bound to localhost."""
+
+    def __init__(self, registry, port):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.registry = registry
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class EventLog:
+    """Append-only JSONL log of job events."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, event, **fields):
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class JobMetrics:
+    """Timings and counters of one job, filled in as it moves through the
+    queue, extraction, download and post-processing."""
+
+    def __init__(self):
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.queue_wait = 0.0
+        self.extract_time = 0.0
+        self.download_time = 0.0
+        self.postprocess_time = 0.0
+        self.bytes = 0
+        self.peak_speed = 0
+        self.retries = 0
+        self.error_class = None
+
+    def average_speed(self):
+        return self.bytes / self.download_time if self.download_time else 0
+
+    def to_dict(self):
+        return {
+            "queue_wait": round(self.queue_wait, 3),
+            "extract_time": round(self.extract_time, 3),
+            "download_time": round(self.download_time, 3),
+            "postprocess_time": round(self.postprocess_time, 3),
+            "bytes": self.bytes,
+            "average_speed": round(self.average_speed()),
+            "peak_speed": round(self.peak_speed),
+            "retries": self.retries,
+            "error_class": self.error_class,
+        }
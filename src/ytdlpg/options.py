@@ -1,30 +1,200 @@
+import json
 import os
 
 
 # Default download path
 default_download_path = os.path.join(os.path.expanduser("~"), "Downloads")
 
+# Where the app keeps its own state (history database, caches, ...)
+default_data_path = os.path.join(os.path.expanduser("~"), ".ytdlpg")
+
+default_event_log_path = os.path.join(default_data_path, "events.jsonl")
+
+# Transfer settings picked by `ytdlpg tune` for this machine and connection.
+tuning_path = os.path.join(default_data_path, "tuning.json")
+
+TRANSFER_OPTIONS = (
+    "concurrent_fragments",
+    "http_chunk_size",
+    "buffer_size",
+    "external_downloader",
+    "external_connections",
+)
+
+
+DEFAULTS = {
+    "format": "best",
+    "output_path": default_download_path,
+    # File names under output_path; see layout.OUTPUT_TEMPLATES for presets.
+    "output_template": "%(title)s.%(ext)s",
+    # Fast local directory for in-progress files, empty means output_path;
+    # finished files are moved into output_path.
+    "staging_path": "",
+    "min_free_space": 256 * 1024 * 1024,  # bytes to leave free on either disk
+    "extract_audio": False,
+    "audio_format": "mp3",
+    "audio_quality": "0",  # Best quality
+    "playlist": False,
+    "subtitles": False,
+    "subtitle_lang": "en",
+    "thumbnail": False,
+    "verbose": False,
+    "quiet": False,
+    "max_concurrent": 3,
+    "per_host_limit": 2,  # 0 means no per-site limit
+    "max_probes": 4,
+    "max_retries": 3,  # for transient and rate-limited failures
+    "retry_delay": 2.0,  # seconds before the first retry, doubled after
+    "host_cooldown": 60,  # seconds a rate-limited site is left alone
+    "use_archive": True,
+    "dedupe_files": False,
+    "rate_limit": 0,  # bytes/s shared by all downloads, 0 means no limit
+    "rate_schedule": "",  # e.g. "09:00-18:00=1M, 23:00-07:00=0"
+    # Transfer tuning. A few HLS/DASH fragments in flight hide per-request
+    # latency without opening many connections to one host, and ranged
+    # requests avoid YouTube's throttling of long single requests.
+    # `ytdlpg tune` measures better values for a given connection.
+    "concurrent_fragments": 4,
+    "http_chunk_size": 10 * 1024 * 1024,  # 0 means one request per file
+    "buffer_size": 0,  # 0 means yt-dlp's default (adaptive) block size
+    "external_downloader": "",  # e.g. "aria2c"; empty uses yt-dlp's own
+    "external_connections": 8,
+    "postprocess_workers": 0,  # 0 means one per CPU core
+    "execution_mode": "thread",  # or "process": yt-dlp runs in worker processes
+    "worker_stall_timeout": 300,  # seconds without progress before a worker is killed
+    "metrics_port": 0,  # Prometheus endpoint on localhost, 0 means off
+    "event_log": "",  # path of a JSONL job event log, empty means off
+}
+
+OPTION_NAMES = tuple(DEFAULTS)
+
+
+def load_tuning(path=tuning_path):
+    """The transfer settings saved by `ytdlpg tune`, if any."""
+    try:
+        with open(path, "r") as f:
+            tuned = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {key: tuned[key] for key in TRANSFER_OPTIONS if key in tuned}
+
 
 class YtdlpOptions:
-    def __init__(self):
-        self.format = "best"
-        self.output_path = default_download_path
-        self.extract_audio = False
-        self.audio_format = "mp3"
-        self.audio_quality = "0"  # Best quality
-        self.playlist = False
-        self.subtitles = False
-        self.subtitle_lang = "en"
-        self.thumbnail = False
-        self.verbose = False
+    """A frozen set of download settings.
+
+    Settings are changed with `replace()`, which returns a new value, so a
+    queued job keeps the options it was queued with however the UI changes
+    them afterwards. Equal options compare and hash equal, which makes them
+    usable as the key of anything prepared from them (see to_ydl_opts()
+    and the manager's YoutubeDL pool).
+    """
+
+    __slots__ = OPTION_NAMES + ("_hash", "_ydl_opts")
+
+    def __init__(self, **changes):
+        values = dict(DEFAULTS)
+        values.update(load_tuning())
+        values.update(changes)
+        self._assign(values)
+
+    def _assign(self, values):
+        unknown = set(values) - set(OPTION_NAMES)
+        if unknown:
+            raise TypeError(f"unknown option(s): {', '.join(sorted(unknown))}")
+        for name in OPTION_NAMES:
+            object.__setattr__(self, name, values[name])
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_ydl_opts", None)
+
+    def replace(self, **changes):
+        values = self.to_dict()
+        values.update(changes)
+        return type(self)._from_values(values)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in OPTION_NAMES}
+
+    @classmethod
+    def from_dict(cls, values):
+        """Options saved with to_dict(), possibly by another version: names
+        no longer known are ignored and new ones take their defaults."""
+        return cls(**{name: values[name] for name in OPTION_NAMES if name in values})
+
+    @classmethod
+    def _from_values(cls, values):
+        # Exactly `values`, without re-reading the saved tuning.
+        options = object.__new__(cls)
+        options._assign(values)
+        return options
+
+    def __reduce__(self):
+        # Copies and pickles are rebuilt from the values; the default way
+        # sets the slots one by one, which __setattr__ refuses.
+        return (type(self)._from_values, (self.to_dict(),))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is frozen, use replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is frozen")
+
+    def _key(self):
+        return tuple(getattr(self, name) for name in OPTION_NAMES)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((type(self), self._key())))
+        return self._hash
+
+    def __repr__(self):
+        changed = [
+            f"{name}={value!r}"
+            for name, value in self.to_dict().items()
+            if value != DEFAULTS[name]
+        ]
+        return f"{type(self).__name__}({', '.join(changed)})"
 
     def to_ydl_opts(self):
+        """yt-dlp options for these settings. They are compiled once per
+        value; each call returns a new top-level dict, which callers may
+        add to, but the nested lists and dicts are shared."""
+        if self._ydl_opts is None:
+            object.__setattr__(self, "_ydl_opts", self._compile_ydl_opts())
+        return dict(self._ydl_opts)
+
+    def _compile_ydl_opts(self):
         opts = {
             "format": self.format,
-            "outtmpl": os.path.join(self.output_path, "%(title)s.%(ext)s"),
+            "outtmpl": os.path.join(
+                self.staging_path or self.output_path, self.output_template
+            ),
             "verbose": self.verbose,
+            "noplaylist": not self.playlist,
         }
 
+        opts["concurrent_fragment_downloads"] = max(1, self.concurrent_fragments)
+        if self.http_chunk_size:
+            opts["http_chunk_size"] = self.http_chunk_size
+        if self.buffer_size:
+            opts["buffersize"] = self.buffer_size
+
+        if self.external_downloader:
+            opts["external_downloader"] = {"default": self.external_downloader}
+            if self.external_downloader == "aria2c":
+                connections = str(min(16, max(1, self.external_connections)))
+                opts["external_downloader_args"] = {
+                    "aria2c": ["-x", connections, "-s", connections, "-k", "1M"]
+                }
+
+        if self.quiet:
+            opts["quiet"] = True
+            opts["noprogress"] = True
+
         if self.extract_audio:
             opts["postprocessors"] = [
                 {
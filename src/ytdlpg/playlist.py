@@ -0,0 +1,39 @@
+import threading
+
+
+def entry_url(entry):
+    url = entry.get("url") or entry.get("webpage_url")
+    if url and "://" in url:
+        return url
+    if entry.get("ie_key") == "Youtube" and entry.get("id"):
+        return f"https://www.youtube.com/watch?v={entry['id']}"
+    return url
+
+
+class PlaylistJob:
+    """Aggregate state of an expanded playlist; its entries run as child jobs."""
+
+    def __init__(self, info, on_progress, on_complete, on_error):
+        self.info = info
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.playlist_id = None
+        self.journal_id = None
+        self.options = None
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.cancelled = False
+        self.expanding = True
+        self.pending = set()
+        self.child_progress = {}
+        self.lock = threading.Lock()
+
+    def update_progress(self):
+        running = sum(self.child_progress.values())
+        self.info["progress"] = (
+            (self.done * 100 + running) / self.total if self.total else 0
+        )
+        self.info["playlist_done"] = self.done
+        self.info["playlist_total"] = self.total
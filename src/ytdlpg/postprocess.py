@@ -0,0 +1,27 @@
+import time
+
+# run_postprocessors() runs in a worker process, so its arguments and result
+# must be picklable: plain option dicts and sanitized info dicts only.
+
+
+def split_postprocessors(ydl_opts):
+    """Split yt-dlp options into the download part and the post-processing
+    part. Returns (download_opts, postprocess_opts), the latter None when
+    nothing has to run after the download."""
+    if not ydl_opts.get("postprocessors"):
+        return ydl_opts, None
+    download_opts = dict(ydl_opts)
+    del download_opts["postprocessors"]
+    return download_opts, dict(ydl_opts)
+
+
+def run_postprocessors(ydl_opts, info):
+    import yt_dlp
+
+    started = time.monotonic()
+    processed = []
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        for requested in info.get("requested_downloads") or [info]:
+            result = ydl.post_process(requested["filepath"], requested)
+            processed.append(ydl.sanitize_info(result))
+    return processed, time.monotonic() - started
@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class ProgressAggregator:
+    """Keeps the latest progress state per download and hands it to `flush`
+    in batches on a fixed tick, instead of one UI update per yt-dlp event."""
+
+    def __init__(self, flush, interval=0.15):
+        self.interval = interval
+        self._flush = flush
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+        self.received = 0
+        self.delivered = 0
+        self.flushes = 0
+
+    @property
+    def coalesced(self):
+        return self.received - self.delivered - len(self._pending)
+
+    def submit(self, key, item):
+        with self._lock:
+            self.received += 1
+            self._pending[key] = item
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "received": self.received,
+                "delivered": self.delivered,
+                "coalesced": self.coalesced,
+                "flushes": self.flushes,
+            }
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+
+            with self._lock:
+                batch = list(self._pending.values())
+                self._pending = {}
+                self._wake.clear()
+                self.delivered += len(batch)
+                if batch:
+                    self.flushes += 1
+
+            if batch:
+                try:
+                    self._flush(batch)
+                except Exception:
+                    # A failed UI refresh must not stop future ticks.
+                    pass
@@ -0,0 +1,15 @@
+import sys
+import time
+
+# Measured from the first import of this module, which the CLI does before
+# anything else.
+_start = time.perf_counter()
+
+enabled = False
+
+
+def mark(name):
+    if enabled:
+        elapsed = (time.perf_counter() - _start) * 1000
+        sys.stderr.write(f"[startup] {elapsed:8.1f} ms  {name}\n")
+        sys.stderr.flush()
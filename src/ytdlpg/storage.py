@@ -0,0 +1,87 @@
+import errno
+import os
+import shutil
+
+
+def _format_size(f):
+    size = f.get("filesize") or f.get("filesize_approx")
+    if not size and f.get("tbr") and f.get("duration"):
+        # tbr is in KBit/s.
+        size = f["tbr"] * 125 * f["duration"]
+    return int(size or 0)
+
+
+def expected_size(info, selector=None):
+    """Bytes a download of `info` is expected to write, from what extraction
+    reported; 0 when nothing is known. `selector` is the yt-dlp format
+    selector the download will use (`YoutubeDL.build_format_selector`);
+    without one, the formats picked at extraction are used."""
+    formats = info.get("formats") or []
+    chosen = None
+    if selector is not None and formats:
+        # The context yt-dlp itself passes to selectors.
+        picked = next(
+            iter(
+                selector(
+                    {
+                        "formats": formats,
+                        "has_merged_format": any(
+                            "none" not in (f.get("acodec"), f.get("vcodec"))
+                            for f in formats
+                        ),
+                        "incomplete_formats": (
+                            all(f.get("vcodec") == "none" for f in formats)
+                            or all(f.get("acodec") == "none" for f in formats)
+                        ),
+                    }
+                )
+            ),
+            None,
+        )
+        if picked:
+            chosen = picked.get("requested_formats") or [picked]
+    if chosen is None:
+        chosen = info.get("requested_formats") or [info]
+    return sum(_format_size({"duration": info.get("duration"), **f}) for f in chosen)
+
+
+def free_space(path):
+    """Free bytes on the file system `path` is (or will be) created on."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return shutil.disk_usage(path).free
+
+
+def move_into_place(source, destination):
+    """Move a finished file to `destination` so that nobody looking at the
+    destination directory ever sees it half-written.
+
+    A rename is atomic on its own. Across file systems the file is copied
+    to a hidden name next to the destination first and renamed once
+    complete, so a slow network share only ever sees the final rename.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.replace(source, destination)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    directory, name = os.path.split(destination)
+    temp = os.path.join(directory, f".{name}.ytdlpg-tmp")
+    try:
+        shutil.copyfile(source, temp)
+        shutil.copystat(source, temp)
+        os.replace(temp, destination)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    os.remove(source)
@@ -0,0 +1,117 @@
+import copy
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from ytdlpg.manager import load_yt_dlp
+from ytdlpg.options import TRANSFER_OPTIONS, YtdlpOptions, tuning_path
+
+# yt-dlp's own behaviour; every candidate is applied on top of this, so a
+# previously saved tuning does not leak into the measurements.
+BASELINE = {
+    "concurrent_fragments": 1,
+    "http_chunk_size": 0,
+    "buffer_size": 0,
+    "external_downloader": "",
+    "external_connections": 8,
+}
+
+
+def candidates():
+    for fragments in (1, 4, 8, 16):
+        for chunk_size in (0, 10 * 1024 * 1024):
+            yield {"concurrent_fragments": fragments, "http_chunk_size": chunk_size}
+    if shutil.which("aria2c"):
+        for connections in (4, 8, 16):
+            yield {"external_downloader": "aria2c", "external_connections": connections}
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def measure(info, settings, seconds=15, format=None):
+    """Download `info` with the given transfer settings for at most `seconds`
+    and return the achieved rate. Partial data is thrown away afterwards."""
+    yt_dlp = load_yt_dlp()
+    directory = tempfile.mkdtemp(prefix="ytdlpg-tune-")
+    options = YtdlpOptions(
+        **{**BASELINE, **settings}, quiet=True, output_path=directory
+    )
+    if format:
+        options = options.replace(format=format)
+    ydl_opts = options.to_ydl_opts()
+    ydl_opts["continuedl"] = False
+
+    timing = {"start": time.monotonic(), "first_byte": None}
+
+    def progress_hook(d):
+        if d.get("downloaded_bytes") and timing["first_byte"] is None:
+            timing["first_byte"] = time.monotonic() - timing["start"]
+        if time.monotonic() - timing["start"] > seconds:
+            raise yt_dlp.utils.DownloadCancelled("time budget used up")
+
+    ydl_opts["progress_hooks"] = [progress_hook]
+    error = None
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            timing["start"] = time.monotonic()
+            ydl.process_ie_result(copy.deepcopy(info), download=True)
+    except yt_dlp.utils.DownloadCancelled:
+        pass
+    except Exception as e:
+        error = str(e)
+    elapsed = time.monotonic() - timing["start"]
+
+    # Counted from disk so external downloaders that report no progress
+    # are measured the same way.
+    downloaded = _directory_size(directory)
+    shutil.rmtree(directory, ignore_errors=True)
+
+    result = dict(settings)
+    result.update(
+        bytes=downloaded,
+        seconds=round(elapsed, 2),
+        rate=downloaded / elapsed if elapsed else 0,
+        first_byte=timing["first_byte"] and round(timing["first_byte"], 3),
+    )
+    if error:
+        result["error"] = error
+    return result
+
+
+def tune(url, seconds=15, format=None, on_result=None):
+    """Try every candidate on `url` and return the results, fastest first."""
+    yt_dlp = load_yt_dlp()
+    with yt_dlp.YoutubeDL({"quiet": True, "no_warnings": True}) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+    results = []
+    for settings in candidates():
+        result = measure(info, settings, seconds, format)
+        results.append(result)
+        if on_result:
+            on_result(result)
+    results.sort(key=lambda result: ("error" in result, -result["rate"]))
+    return results
+
+
+def save_tuning(result, path=tuning_path):
+    tuned = dict(BASELINE)
+    tuned.update({key: result[key] for key in TRANSFER_OPTIONS if key in result})
+    tuned["measured_rate"] = round(result["rate"])
+    tuned["measured_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(tuned, f, indent=2)
+    return tuned
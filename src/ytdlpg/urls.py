@@ -0,0 +1,99 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from ytdlpg.cache import YOUTUBE_ID_RE, cache_key
+
+# Anything that looks like a link in pasted text, a .txt list or a CSV cell.
+URL_RE = re.compile(
+    r"(?:https?://|www\.|(?:m\.|music\.)?youtube\.com/|youtu\.be/)[^\s,;\"'<>]+",
+    re.I,
+)
+
+# Query parameters that only say where a link was shared from.
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "ref",
+    "ref_src",
+    "si",
+    "feature",
+    "pp",
+}
+
+
+def _trim_url(url):
+    # Drop punctuation that ends the sentence or the brackets around a link,
+    # but keep a closing paren the link opened itself, as in wiki URLs.
+    while url and url[-1] in ").]":
+        if url[-1] == ")" and url.count("(") >= url.count(")"):
+            break
+        url = url[:-1]
+    return url
+
+
+def extract_urls(text):
+    return [_trim_url(match.group(0)) for match in URL_RE.finditer(text)]
+
+
+def normalize_url(url):
+    """Canonical form of a link: every youtu.be, shorts, embed, mobile or
+    music variant of a YouTube video becomes its watch URL, and tracking
+    parameters and fragments are dropped from everything else."""
+    url = url.strip()
+    if not re.match(r"https?://", url, re.I):
+        url = "https://" + url
+
+    parts = urlsplit(url)
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in TRACKING_PARAMS and not name.startswith("utm_")
+    ]
+
+    match = YOUTUBE_ID_RE.search(url)
+    if match:
+        canonical = [("v", match.group(1))]
+        # Keep the playlist, so playlist mode still sees it.
+        canonical += [(name, value) for name, value in query if name == "list"]
+        return "https://www.youtube.com/watch?" + urlencode(canonical)
+
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path or "/",
+            urlencode(query),
+            "",
+        )
+    )
+
+
+def unique_urls(urls):
+    """Normalizes links and drops the ones that point at the same media,
+    keeping the first. Entries that are not links (yt-dlp also takes
+    "ytsearch:..." and the like) are kept as they are. Returns (urls,
+    number of duplicates dropped)."""
+    unique = []
+    seen = set()
+    for url in urls:
+        url = normalize_url(url) if URL_RE.match(url) else url.strip()
+        key = cache_key(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique, len(urls) - len(unique)
+
+
+def parse_urls(text):
+    """unique_urls() of the links found in `text`, in order of first
+    appearance."""
+    return unique_urls(extract_urls(text))
+
+
+def read_url_file(path):
+    """URLs from a text or CSV file; see parse_urls()."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return parse_urls(f.read())
@@ -0,0 +1,212 @@
+import bisect
+import math
+
+import flet as ft
+
+
+class VirtualList:
+    """A scrolling list that only materializes the rows around the viewport.
+
+    A fixed pool of row controls is built once with `build_row` and re-bound
+    to whichever items are visible with `bind_row` as the user scrolls. Two
+    spacer containers stand in for the rows above and below the window, so
+    the control tree (and every update sent to Flutter) stays the same size
+    no matter how many items the list holds. Rows must be `item_extent` high.
+    """
+
+    def __init__(
+        self,
+        build_row,
+        bind_row,
+        item_extent,
+        height,
+        key=lambda item: item["id"],
+        overscan=4,
+        on_end_reached=None,
+        on_start_reached=None,
+        max_items=None,
+    ):
+        self.items = []
+        self.item_extent = item_extent
+        self._build_row = build_row
+        self._bind_row = bind_row
+        self._key = key
+        self._overscan = overscan
+        self._on_end_reached = on_end_reached
+        self._on_start_reached = on_start_reached
+        # Rows past this many are dropped from the far end of the list; the
+        # callbacks above bring them back when scrolled to.
+        self._max_items = max_items
+        self._trimmed_start = False
+        self._end_exhausted = False
+        self._first_visible = 0
+        self._bound = {}
+        # Every item has an ascending sort number, so finding an item's
+        # position by key is an O(log n) bisect of _seqs instead of a scan;
+        # deleting it from the lists is still O(n).
+        self._seqs = []
+        self._seq_of = {}
+
+        pool_size = math.ceil(height / item_extent) + 2 * overscan
+        self._rows = [build_row() for _ in range(pool_size)]
+        self._top = ft.Container(height=0)
+        self._bottom = ft.Container(height=0)
+
+        self.view = ft.ListView(
+            controls=[self._top, *self._rows, self._bottom],
+            spacing=0,
+            height=height,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=50,
+        )
+        self._render()
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def trimmed_start(self):
+        """Whether rows were dropped from the top to stay under max_items."""
+        return self._trimmed_start
+
+    def set_items(self, items):
+        self._trimmed_start = False
+        self._end_exhausted = False
+        self.items = list(items)
+        self._seqs = list(range(len(self.items)))
+        self._seq_of = {self._key(item): seq for seq, item in enumerate(self.items)}
+        self._trim_end()
+        self._render()
+
+    def _add(self, index, items):
+        if index == 0:
+            first = self._seqs[0] if self._seqs else 0
+            seqs = range(first - len(items), first)
+        elif index == len(self.items):
+            last = self._seqs[-1] if self._seqs else -1
+            seqs = range(last + 1, last + 1 + len(items))
+        else:
+            # Somewhere in between: spread them between the neighbours.
+            low, high = self._seqs[index - 1], self._seqs[index]
+            step = (high - low) / (len(items) + 1)
+            seqs = [low + step * (n + 1) for n in range(len(items))]
+        self.items[index:index] = items
+        self._seqs[index:index] = seqs
+        for item, seq in zip(items, seqs):
+            self._seq_of[self._key(item)] = seq
+
+    def _drop(self, start, end):
+        for item in self.items[start:end]:
+            self._seq_of.pop(self._key(item), None)
+        del self.items[start:end]
+        del self._seqs[start:end]
+
+    def _trim_end(self):
+        if self._max_items is not None and len(self.items) > self._max_items:
+            self._drop(self._max_items, len(self.items))
+            self._end_exhausted = False
+
+    def _trim_start(self):
+        # Returns how many rows were dropped from the top.
+        excess = len(self.items) - (self._max_items or len(self.items))
+        if excess > 0:
+            self._trimmed_start = True
+            self._drop(0, excess)
+            self._first_visible = max(0, self._first_visible - excess)
+            return excess
+        return 0
+
+    def insert(self, index, item):
+        self._add(index, [item])
+        self._trim_end()
+        self._render()
+
+    def prepend(self, items):
+        self._add(0, list(items))
+        self._trim_end()
+        self._render()
+
+    def extend(self, items):
+        self._add(len(self.items), list(items))
+        dropped = self._trim_start()
+        self._render()
+        return dropped
+
+    def remove(self, key):
+        seq = self._seq_of.get(key)
+        if seq is None:
+            return None
+        index = bisect.bisect_left(self._seqs, seq)
+        item = self.items[index]
+        self._drop(index, index + 1)
+        self._render()
+        return item
+
+    def refresh(self, key):
+        # Rebinds the row showing `key`; returns None when it is off-screen.
+        row = self._bound.get(key)
+        if row is not None:
+            self._bind_row(row, row.data["item"])
+        return row
+
+    def update(self):
+        if self.view.page:
+            self.view.update()
+
+    def _on_scroll(self, e):
+        first_visible = int(e.pixels // self.item_extent)
+        if first_visible != self._first_visible:
+            self._first_visible = first_visible
+            self._render()
+            self.view.update()
+
+        near_end = e.pixels >= e.max_scroll_extent - self.item_extent
+        if self._on_end_reached and near_end and not self._end_exhausted:
+            # The callback returns older items to append, if there are any.
+            items = self._on_end_reached()
+            self._end_exhausted = not items
+            if items:
+                dropped = self.extend(items)
+                self.view.update()
+                if dropped:
+                    # Keep the same rows in view now the ones above are gone.
+                    self.view.scroll_to(
+                        offset=max(0, e.pixels - dropped * self.item_extent)
+                    )
+        elif (
+            self._trimmed_start
+            and self._on_start_reached
+            and e.pixels < self.item_extent
+        ):
+            # The callback returns the newer items dropped earlier, if any.
+            items = self._on_start_reached()
+            self._trimmed_start = bool(items)
+            if items:
+                self._add(0, list(items))
+                self._trim_end()
+                self._first_visible += len(items)
+                self._render()
+                self.view.update()
+                self.view.scroll_to(offset=e.pixels + len(items) * self.item_extent)
+
+    def _render(self):
+        pool_size = len(self._rows)
+        start = max(0, self._first_visible - self._overscan)
+        start = max(0, min(start, len(self.items) - pool_size))
+        end = min(len(self.items), start + pool_size)
+
+        self._top.height = start * self.item_extent
+        self._bottom.height = (len(self.items) - end) * self.item_extent
+
+        self._bound = {}
+        for offset, row in enumerate(self._rows):
+            index = start + offset
+            if index < end:
+                item = self.items[index]
+                row.visible = True
+                row.data["item"] = item
+                self._bind_row(row, item)
+                self._bound[self._key(item)] = row
+            else:
+                row.visible = False
+                row.data["item"] = None
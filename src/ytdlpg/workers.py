@@ -0,0 +1,297 @@
+"""Download worker processes.
+
+In process mode the manager keeps scheduling, bandwidth sharing and the
+UI in the main process and hands the yt-dlp work of each job to one of a
+pool of worker processes. Each worker runs one job at a time over a pipe:
+
+    main -> worker   ("run", key, ydl_opts, url, info, rate)
+                     ("stop", reason) / ("limit", rate)
+    worker -> main   ("started",)      yt-dlp is loaded and the job begins
+                     ("progress", d)   a trimmed yt-dlp progress dict
+                     ("done", info) / ("error", message) / ("cancelled",)
+
+Progress is sent at most every PROGRESS_INTERVAL seconds, apart from
+state changes. A worker that dies or goes quiet for too long is killed
+and replaced, and its job fails like any other download would.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+PROGRESS_INTERVAL = 0.1
+
+# Seconds a new worker gets to start up and import yt-dlp.
+STARTUP_TIMEOUT = 60
+
+# What the main process reads from a yt-dlp progress dict.
+PROGRESS_KEYS = (
+    "status",
+    "downloaded_bytes",
+    "total_bytes",
+    "total_bytes_estimate",
+    "speed",
+    "filename",
+    "tmpfilename",
+)
+
+
+class WorkerError(Exception):
+    def __init__(self, message, healthy=False):
+        super().__init__(message)
+        # Whether the worker can take another job after this.
+        self.healthy = healthy
+
+
+def process_context():
+    """The multiprocessing context for every process the app starts: forking
+    a process full of threads (Flet, downloads) is unsafe."""
+    return multiprocessing.get_context("spawn")
+
+
+def _trim_progress(d):
+    trimmed = {key: d[key] for key in PROGRESS_KEYS if d.get(key) is not None}
+    title = (d.get("info_dict") or {}).get("title")
+    if title is not None:
+        trimmed["info_dict"] = {"title": title}
+    return trimmed
+
+
+def _serve(conn):
+    # Worker process entry point. A reader thread owns the pipe, so stop and
+    # limit messages are seen while a download blocks the main thread.
+    from ytdlpg.bandwidth import TokenBucket
+    from ytdlpg.layout import add_template_fields
+    from ytdlpg.manager import load_yt_dlp
+    from ytdlpg.ydl_pool import YoutubeDLPool
+
+    yt_dlp = load_yt_dlp()
+    requests = queue.Queue()
+    state = {"stop": threading.Event(), "reason": None, "bucket": TokenBucket()}
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def read():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                # The main process is gone; nothing left to work for.
+                os._exit(0)
+            if message[0] == "run":
+                # A stop that crossed the previous job's result is stale.
+                state["stop"].clear()
+                state["reason"] = None
+                requests.put(message)
+            elif message[0] == "stop":
+                state["reason"] = message[1]
+                state["stop"].set()
+            elif message[0] == "limit":
+                state["bucket"].set_rate(message[1])
+
+    threading.Thread(target=read, daemon=True).start()
+    pool = YoutubeDLPool(load_yt_dlp, max_idle=2)
+
+    while True:
+        _, key, ydl_opts, url, info, rate = requests.get()
+        send(("started",))
+        stop = state["stop"]
+        bucket = state["bucket"]
+        bucket.set_rate(rate)
+        progress = {"sent": 0, "bytes": None, "filename": None}
+        progress_lock = threading.Lock()
+
+        def check_stopped():
+            if stop.is_set():
+                raise yt_dlp.utils.DownloadCancelled(f"Download {state['reason']}")
+
+        def progress_hook(d):
+            check_stopped()
+            now = time.monotonic()
+            filename = d.get("tmpfilename") or d.get("filename")
+            # Fragment threads report concurrently, as in the main process.
+            with progress_lock:
+                changed = (
+                    d["status"] != "downloading" or filename != progress["filename"]
+                )
+                downloaded = d.get("downloaded_bytes") or 0
+                last = progress["bytes"]
+                progress["bytes"] = downloaded
+                progress["filename"] = filename
+                due = changed or now - progress["sent"] >= PROGRESS_INTERVAL
+                if due:
+                    progress["sent"] = now
+            if d["status"] == "downloading" and last is not None and downloaded > last:
+                bucket.consume(downloaded - last, stop)
+                check_stopped()
+            if d["status"] == "finished":
+                progress["bytes"] = None
+            if due:
+                send(("progress", _trim_progress(d)))
+
+        def postprocessor_hook(d):
+            if state["reason"] == "cancelled":
+                check_stopped()
+
+        pooled = pool.acquire(key, lambda: ydl_opts)
+        pooled.progress_hook = progress_hook
+        pooled.postprocessor_hook = postprocessor_hook
+        reusable = False
+        try:
+            # The job may have been stopped while this worker started up.
+            check_stopped()
+            ydl = pooled.ydl
+            result = None
+            if info is not None:
+                try:
+                    result = ydl.process_ie_result(info, download=True)
+                except yt_dlp.utils.DownloadCancelled:
+                    raise
+                except yt_dlp.utils.DownloadError:
+                    # Format URLs from the probe may have expired.
+                    check_stopped()
+            if result is None:
+                info = add_template_fields(ydl.extract_info(url, download=False))
+                result = ydl.process_ie_result(info, download=True)
+            send(("done", ydl.sanitize_info(result)))
+            reusable = True
+        except yt_dlp.utils.DownloadCancelled:
+            send(("cancelled",))
+        except Exception as e:
+            send(("error", str(e) or type(e).__name__))
+        finally:
+            pool.release(pooled, reusable)
+
+
+class WorkerProcess:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child_conn,), name="ytdlpg-worker", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def send(self, message):
+        self.conn.send(message)
+
+    def poll(self, timeout):
+        return self.conn.poll(timeout)
+
+    def recv(self):
+        return self.conn.recv()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+
+class WorkerPool:
+    """Idle worker processes. Workers are started on demand, reused by
+    later jobs and killed when they misbehave."""
+
+    def __init__(self):
+        self._context = process_context()
+        self._idle = []
+        self._lock = threading.Lock()
+        self.started = 0
+        self.killed = 0
+
+    def acquire(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.is_alive():
+                    return worker
+            self.started += 1
+        return WorkerProcess(self._context)
+
+    def release(self, worker, healthy=True):
+        if healthy and worker.is_alive():
+            with self._lock:
+                self._idle.append(worker)
+            return
+        with self._lock:
+            self.killed += 1
+        worker.kill()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill()
+
+
+def run_in_worker(
+    worker, job, key, ydl_opts, info, get_limit, on_progress, stall_timeout
+):
+    """Run `job` in `worker`, feeding trimmed progress dicts to
+    `on_progress` and passing on stop requests and limit changes. Returns
+    the sanitized info dict; raises DownloadCancelled if the job was
+    stopped and WorkerError if the download or the worker failed."""
+    from ytdlpg.manager import load_yt_dlp
+
+    yt_dlp = load_yt_dlp()
+    limit = get_limit()
+    worker.send(("run", key, ydl_opts, job.info["url"], info, limit))
+    last_message = time.monotonic()
+    started = False
+    stop_sent = None
+
+    while True:
+        if job.stop_event.is_set() and stop_sent is None:
+            worker.send(("stop", job.stop_reason))
+            stop_sent = time.monotonic()
+        current = get_limit()
+        if current != limit:
+            limit = current
+            worker.send(("limit", limit))
+
+        if not worker.poll(0.5):
+            now = time.monotonic()
+            if not worker.is_alive():
+                raise WorkerError(
+                    f"Worker process exited unexpectedly "
+                    f"(exit code {worker.process.exitcode})"
+                )
+            if stop_sent is not None and now - stop_sent > 10:
+                raise WorkerError("Worker process did not stop when asked")
+            if not started:
+                if now - last_message > STARTUP_TIMEOUT:
+                    raise WorkerError("Worker process did not start")
+            elif now - last_message > stall_timeout:
+                raise WorkerError(
+                    f"Worker process timed out: no progress for {stall_timeout}s"
+                )
+            continue
+
+        try:
+            message = worker.recv()
+        except (EOFError, OSError):
+            raise WorkerError("Worker process exited unexpectedly")
+        last_message = time.monotonic()
+
+        kind = message[0]
+        if kind == "started":
+            started = True
+        elif kind == "progress":
+            try:
+                on_progress(message[1])
+            except yt_dlp.utils.DownloadCancelled:
+                # Stop requested; the worker is told on the next pass.
+                pass
+        elif kind == "done":
+            return message[1]
+        elif kind == "cancelled":
+            raise yt_dlp.utils.DownloadCancelled(f"Download {job.stop_reason}")
+        elif kind == "error":
+            raise WorkerError(message[1], healthy=True)
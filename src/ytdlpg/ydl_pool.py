@@ -0,0 +1,80 @@
+import threading
+
+
+class PooledYoutubeDL:
+    """A YoutubeDL instance and the hooks of the job currently using it.
+
+    The instance is built with dispatcher hooks that call whatever job
+    hooks are set here, so it can move from job to job unchanged.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.ydl = None
+        self.progress_hook = None
+        self.postprocessor_hook = None
+
+    def _on_progress(self, d):
+        if self.progress_hook is not None:
+            self.progress_hook(d)
+
+    def _on_postprocess(self, d):
+        if self.postprocessor_hook is not None:
+            self.postprocessor_hook(d)
+
+
+class YoutubeDLPool:
+    """Idle YoutubeDL instances, keyed by what they were built from.
+
+    Constructing a YoutubeDL sets up its network opener, cookie jar and
+    post-processors, which adds up when a burst of jobs starts at once.
+    An instance is only ever used by one job at a time; the least
+    recently used ones are closed once more than `max_idle` are waiting.
+    """
+
+    def __init__(self, load_yt_dlp, max_idle=8):
+        self._load_yt_dlp = load_yt_dlp
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, key, make_opts):
+        """An idle instance for `key`, or a new one built from the options
+        `make_opts()` returns (it is only called on a miss)."""
+        with self._lock:
+            for index in range(len(self._idle) - 1, -1, -1):
+                if self._idle[index].key == key:
+                    self.reused += 1
+                    return self._idle.pop(index)
+            self.created += 1
+
+        pooled = PooledYoutubeDL(key)
+        opts = make_opts()
+        opts["progress_hooks"] = [pooled._on_progress]
+        opts["postprocessor_hooks"] = [pooled._on_postprocess]
+        pooled.ydl = self._load_yt_dlp().YoutubeDL(opts)
+        return pooled
+
+    def release(self, pooled, reusable=True):
+        """Return an instance. Ones whose job failed or was stopped midway
+        are closed instead, as their state is not worth trusting."""
+        pooled.progress_hook = None
+        pooled.postprocessor_hook = None
+        evicted = []
+        if reusable:
+            with self._lock:
+                self._idle.append(pooled)
+                while len(self._idle) > self.max_idle:
+                    evicted.append(self._idle.pop(0))
+        else:
+            evicted.append(pooled)
+        for pooled in evicted:
+            pooled.ydl.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            pooled.ydl.close()